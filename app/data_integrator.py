@@ -3,6 +3,12 @@ import subprocess
 import sys
 import json
 import os
+import pickle
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dateutil import tz
 
 # 将项目根目录添加到Python路径中，以允许从 'fetchers' 目录导入模块
 # 这解决了当从 'app' 目录运行脚本时出现的模块未找到问题
@@ -14,152 +20,280 @@ from fetchers.eastmoney_fetcher import (
     crawl_stock_ranking_data, 
     get_market_options
 )
-# All detail fetchers are now called via subprocess
-# from hk_details_fetcher import fetch_hk_stock_details
-# from stock_details_fetcher import get_stock_details 
-# from fetchers.news_fetcher import get_company_news
+from fetchers.hk_details_fetcher import fetch_hk_stock_details
+from fetchers.stock_details_fetcher import get_stock_details
+from fetchers.news_fetcher import get_company_news
+from batch_crawler.cache import cached_details, cached_news, invalidate, DETAILS_CACHE, NEWS_CACHE
+from fetchers.ipc import run_fetcher, read_pickle, read_json, text_output, dataframe_from_payload
+
+logger = logging.getLogger(__name__)
+
+# 设置 FC_ISOLATE=1 时退回到旧的子进程模式，每次抓取都在独立进程中运行，
+# 即使 Playwright 崩溃也不会影响主进程。
+ISOLATE_FETCHERS = os.environ.get('FC_ISOLATE') == '1'
+
+# Streamlit 每次重跑脚本都在新线程中执行，而 Playwright 同步API的对象只能在
+# 创建它的线程里使用。因此进程内抓取统一交给这两个常驻线程执行，
+# 它们各自持有的浏览器在多次请求之间保持复用。
+# 两个线程让财务详情和新闻可以同时抓取，总耗时取两者中较慢的一个。
+_FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='fetcher')
+
+# 进程内模式下等待财务详情和新闻结果的最长秒数（子进程模式由各自的子进程超时控制）
+# 新闻抓取自身在 news_fetcher.NEWS_FETCH_DEADLINE 内结束，NEWS_FETCH_TIMEOUT 需比它略长，超时后抓取线程不会继续被占用
+DETAILS_FETCH_TIMEOUT = 90
+NEWS_FETCH_TIMEOUT = 30
+
+# 子进程模式下各市场对应的详情 fetcher 模块及其脚本名 (用于错误信息)
+_PYEXE = sys.executable
+_DETAIL_MODULES = {
+    'A-Share': ('fetchers.stock_details_fetcher', 'stock_details_fetcher.py'),
+    'HK-Share': ('fetchers.hk_details_fetcher', 'hk_details_fetcher.py'),
+}
+_NEWS_MODULE = 'fetchers.news_fetcher'
+
+# 新闻的 publishTime 是按本地时间生成的时间戳，显示日期时换算回本地时区。
+# tzlocal 按系统时区规则逐个时刻换算，夏令时前后的时间戳也能得到正确的日期
+_LOCAL_TZ = tz.tzlocal()
+
+# 市场排名数据的内存缓存 {market_name: (获取时间, DataFrame)}
+# Streamlit 每次交互都会重跑脚本并重新请求排名数据，短时间内直接复用上一次的结果
+MARKET_DATA_TTL = 60
+_MARKET_DATA_CACHE = {}
+_MARKET_DATA_LOCK = threading.Lock()
+
+# 个股详情的内存缓存 {(stock_code, market_name): (获取时间, 结果字典)}
+# 选中某只股票后，页面上的每次交互都会重跑脚本并再次请求它的详情
+STOCK_DETAILS_TTL = 300
+_STOCK_DETAILS_CACHE = {}
+_STOCK_DETAILS_LOCK = threading.Lock()
+
+# 市场选项在运行期间不会变化，导入时取一次即可
+_MARKET_OPTIONS = get_market_options()
 
 def get_integrated_market_data(market_name):
     """
-    获取整合后的市场数据
+    获取整合后的市场数据，MARKET_DATA_TTL 秒内的重复调用直接返回缓存的结果。
     :param market_name: 市场名称
     :return: pandas DataFrame
     """
-    return crawl_stock_ranking_data(market_name)
+    with _MARKET_DATA_LOCK:
+        cached = _MARKET_DATA_CACHE.get(market_name)
+    if cached is not None and time.monotonic() - cached[0] < MARKET_DATA_TTL:
+        return cached[1]
+
+    df = crawl_stock_ranking_data(market_name)
+    # 获取失败时不缓存，下次调用仍会重新请求
+    if df is not None and not df.empty:
+        with _MARKET_DATA_LOCK:
+            _MARKET_DATA_CACHE[market_name] = (time.monotonic(), df)
+    return df
+
+def clear_market_data_cache():
+    """
+    清空市场排名数据的缓存，下次调用 get_integrated_market_data 时重新请求。
+    """
+    with _MARKET_DATA_LOCK:
+        _MARKET_DATA_CACHE.clear()
 
 def get_integrated_stock_details(stock_code, market_name):
     """
-    通过独立的子进程执行相应的详情获取脚本 (A股或港股)，以隔离Playwright环境。
+    获取个股的财务数据和新闻资讯 (A股或港股)。
+    默认在进程内直接调用各个 fetcher，并复用常驻线程的 Playwright 浏览器；
+    设置 FC_ISOLATE=1 时改为通过独立的子进程执行，以隔离Playwright环境。
+    两种方式下财务详情和新闻都是并行抓取的。
+    STOCK_DETAILS_TTL 秒内对同一只股票的重复调用直接返回缓存的结果（出错的结果不缓存）。
     :param stock_code: 股票代码
     :param market_name: 市场名称 ("沪深京A股" 或 "知名港股")
     :return: dict 包含财务数据和新闻资讯
     """
-    error_msg = None
-    financial_df = None
-    financial_raw_data = {}
-    
-    market_type = get_market_options().get(market_name, {}).get("type")
+    key = (stock_code, market_name)
+    with _STOCK_DETAILS_LOCK:
+        cached = _STOCK_DETAILS_CACHE.get(key)
+    if cached is not None and time.monotonic() - cached[0] < STOCK_DETAILS_TTL:
+        return cached[1]
 
-    script_name = ""
-    script_dir = "fetchers"  # 定义脚本所在的目录
+    details = _fetch_integrated_stock_details(stock_code, market_name)
+    if not details.get('error_msg'):
+        with _STOCK_DETAILS_LOCK:
+            _STOCK_DETAILS_CACHE[key] = (time.monotonic(), details)
+    return details
 
-    if market_type == "A-Share":
-        script_name = "stock_details_fetcher.py"
-    elif market_type == "HK-Share":
-        script_name = "hk_details_fetcher.py"
-    else:
+def invalidate_stock_details(stock_code):
+    """
+    丢弃某只股票的详情缓存（内存和磁盘），下次调用 get_integrated_stock_details 时重新抓取。
+    :param stock_code: 股票代码
+    """
+    with _STOCK_DETAILS_LOCK:
+        for key in [key for key in _STOCK_DETAILS_CACHE if key[0] == stock_code]:
+            del _STOCK_DETAILS_CACHE[key]
+    invalidate(get_stock_details, stock_code, DETAILS_CACHE)
+    invalidate(fetch_hk_stock_details, stock_code, DETAILS_CACHE)
+    invalidate(get_company_news, stock_code, NEWS_CACHE)
+
+def _fetch_integrated_stock_details(stock_code, market_name):
+    """
+    get_integrated_stock_details 的实际抓取逻辑，不经过内存缓存。
+    :return: dict 包含财务数据和新闻资讯
+    """
+    market_type = _MARKET_OPTIONS.get(market_name, {}).get("type")
+
+    if market_type not in ("A-Share", "HK-Share"):
         error_msg = f"未知的市场类型: {market_name}"
         financial_df, financial_raw_data = _get_fallback_financial_data()
         # Early return if market type is invalid
         return {
             'financial_data': financial_df,
+            'financial_display': format_financial_data_for_display(financial_df),
             'financial_raw_data': financial_raw_data,
             'error_msg': error_msg,
             'news_data': []
         }
 
+    if ISOLATE_FETCHERS:
+        details_future = _FETCH_EXECUTOR.submit(_get_details_via_subprocess, stock_code, market_name, market_type)
+        news_future = _FETCH_EXECUTOR.submit(_get_news_via_subprocess, stock_code)
+        # 子进程内部已有各自的超时，这里只需等待两者完成
+        details_timeout = news_timeout = None
+    else:
+        details_future = _FETCH_EXECUTOR.submit(_get_details_in_process, stock_code, market_name, market_type)
+        news_future = _FETCH_EXECUTOR.submit(_get_news_in_process, stock_code)
+        # 进程内抓取没有外部超时，卡住的页面不能让详情面板一直等待
+        details_timeout, news_timeout = DETAILS_FETCH_TIMEOUT, NEWS_FETCH_TIMEOUT
+
+    # 两者同时进行，总等待时间取较慢的一个；超时的一方退回到默认结果
     try:
-        # 构建脚本的完整路径
-        script_path = os.path.join(script_dir, script_name)
-        command = [sys.executable, script_path, stock_code]
-        
-        # --- 增加的调试输出 ---
-        print("\n" + "="*50)
-        print("--- [DEBUG] Pre-subprocess Execution Info ---")
-        print(f"    Market Name Received: {market_name}")
-        print(f"    Determined Market Type: {market_type}")
-        print(f"    Selected Script: {script_name}")
-        print(f"    Full Command: {' '.join(command)}")
-        print("="*50 + "\n")
-        # --- 调试输出结束 ---
+        financial_df, financial_raw_data, error_msg = details_future.result(timeout=details_timeout)
+    except FutureTimeoutError:
+        financial_df, financial_raw_data = _get_fallback_financial_data()
+        error_msg = f"获取 {market_name} 财务数据超时"
+    try:
+        news_data, news_error = news_future.result(timeout=news_timeout)
+    except FutureTimeoutError:
+        news_data, news_error = [], "获取新闻数据超时"
 
-        process = subprocess.run(
-            command,
-            capture_output=True,
-            # text=True and encoding='utf-8' are removed. We will handle decoding manually.
-            check=False, # We also set check=False to handle non-zero exits manually.
-            timeout=90
-        )
+    if news_error:
+        # 如果财务数据部分没有错误，就用新闻部分的错误覆盖
+        if not error_msg:
+            error_msg = news_error
+
+    # A股URL在raw_data['comparison_data']['url']
+    # 港股URL在raw_data['url']
+    details_url = financial_raw_data.get('comparison_data', {}).get('url') or financial_raw_data.get('url')
+
+    return {
+        'financial_data': financial_df,
+        # 显示用的表格在抓取后生成一次，随结果一起缓存，页面重跑时不再重复 set_index
+        'financial_display': format_financial_data_for_display(financial_df),
+        'financial_raw_data': financial_raw_data,
+        'error_msg': error_msg,
+        'news_data': news_data,
+        'details_url': details_url
+    }
+
+def _get_details_in_process(stock_code, market_name, market_type):
+    """
+    在当前进程中直接调用详情 fetcher，成功的结果会写入磁盘缓存。
+    :return: (DataFrame, dict, str or None) -> (财务数据, 原始数据, 错误信息)
+    """
+    try:
+        if market_type == "A-Share":
+            financial_df, financial_raw_data, error_msg = cached_details(get_stock_details, stock_code)
+        else:
+            financial_df, financial_raw_data, error_msg = cached_details(fetch_hk_stock_details, stock_code)
+    except Exception as e:
+        financial_df, financial_raw_data, error_msg = None, None, f"获取 {market_name} 财务数据时出错: {e}"
+
+    if financial_df is None:
+        if not error_msg:
+            error_msg = f"未能获取 {stock_code} 的有效数据。"
+        financial_df, financial_raw_data = _get_fallback_financial_data()
+
+    return financial_df, financial_raw_data or {}, error_msg
+
+def _get_news_in_process(stock_code):
+    """
+    在当前进程中直接调用 news_fetcher 获取新闻。
+    :param stock_code: 股票代码
+    :return: (list, str or None) 返回新闻列表和错误信息
+    """
+    try:
+        return cached_news(get_company_news, stock_code), None
+    except Exception as e:
+        return [], f"获取新闻时出错: {e}"
+
+def _get_details_via_subprocess(stock_code, market_name, market_type):
+    """
+    通过独立的子进程执行相应的详情获取脚本 (A股或港股)，以隔离Playwright环境。
+    :return: (DataFrame, dict, str or None) -> (财务数据, 原始数据, 错误信息)
+    """
+    error_msg = None
+    financial_df = None
+    financial_raw_data = {}
+
+    module_name, script_name = _DETAIL_MODULES[market_type]
+
+    try:
+        # 以模块方式运行，使子进程能够导入 fetchers 包
+        # --ipc=pickle 让子进程把 DataFrame 原样 pickle 传回，省去JSON编解码
+        command = [_PYEXE, "-m", module_name, stock_code, "--ipc=pickle"]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Pre-subprocess: market_name=%s, market_type=%s, module=%s, command=%s",
+                         market_name, market_type, module_name, ' '.join(command))
+
+        # 子进程运行期间持续读取输出，结果一旦完整就不再等待子进程自行退出。
+        # stdout/stderr 以原始字节返回，下面手动解码；非零退出码也在下面手动处理。
+        process = run_fetcher(command, timeout=90, cwd=project_root)
         
         stdout_str = ""
         stderr_str = ""
 
         # Manually decode stdout and stderr to handle potential encoding issues on Windows
+        # stdout 中只有 pickle 帧之前的调试输出是文本
+        stdout_text = text_output(process.stdout)
         try:
-            stdout_str = process.stdout.decode('utf-8')
+            stdout_str = stdout_text.decode('utf-8')
         except UnicodeDecodeError:
-            stdout_str = process.stdout.decode('gbk', errors='ignore') # Fallback to gbk
+            stdout_str = stdout_text.decode('gbk', errors='ignore') # Fallback to gbk
 
         try:
             stderr_str = process.stderr.decode('utf-8')
         except UnicodeDecodeError:
             stderr_str = process.stderr.decode('gbk', errors='ignore') # Fallback to gbk
 
-        # 打印子进程的输出以供调试
-        print(f"--- [DEBUG] 子进程输出 ({script_name} {stock_code}) ---")
+        # 子进程的输出只在 DEBUG 级别记录，且只截取开头部分
         if stdout_str:
-            print("--- STDOUT ---")
-            print(stdout_str)
+            logger.debug("%s %s stdout (%d bytes): %s", script_name, stock_code, len(stdout_str), stdout_str[:2000])
         if stderr_str:
-            print("--- STDERR ---", file=sys.stderr)
-            print(stderr_str, file=sys.stderr)
-        print("-----------------------------------------------------\n")
+            logger.debug("%s %s stderr (%d bytes): %s", script_name, stock_code, len(stderr_str), stderr_str[:2000])
         
         # Now, check for errors or empty output
-        if process.returncode != 0 and not stdout_str: # check 'and'
+        if process.returncode != 0 and not process.stdout: # check 'and'
             error_msg = f"子进程 {script_name} 执行失败或无返回。"
             if stderr_str:
                 error_msg += f" 错误信息: {stderr_str}"
             financial_df, financial_raw_data = _get_fallback_financial_data()
             # Skip to the end after setting the error
-            return {
-                'financial_data': financial_df,
-                'financial_raw_data': financial_raw_data,
-                'error_msg': error_msg,
-                'news_data': [], # No news data if financial data fails
-                'details_url': None
-            }
-        
-        # [FIX] Clean the subprocess output to extract only the valid JSON object.
-        # This handles cases where debug prints from the subprocess are mixed with the JSON output.
-        json_str = None
-        brace_level = 0
-        json_start = -1
-
-        for i, char in enumerate(stdout_str):
-            if char == '{':
-                if brace_level == 0:
-                    json_start = i
-                brace_level += 1
-            elif char == '}':
-                if brace_level > 0:
-                    brace_level -= 1
-                    if brace_level == 0:
-                        json_str = stdout_str[json_start : i + 1]
-                        break
+            return financial_df, financial_raw_data, error_msg
         
-        if not json_str:
-            error_msg = f"无法从子进程输出中提取有效的JSON数据。原始输出: {stdout_str[:200]}..."
-            financial_df, financial_raw_data = _get_fallback_financial_data()
-            return {
-                'financial_data': financial_df,
-                'financial_raw_data': financial_raw_data,
-                'error_msg': error_msg,
-                'news_data': [], # No news data if financial data fails
-                'details_url': None
-            }
-
-
-        result = json.loads(json_str)
-        # More robust handling of the returned JSON
-        financial_df_json = result.get('dataframe')
-        if financial_df_json:
-            financial_df = pd.read_json(financial_df_json, orient='split')
+        pickled = read_pickle(process.stdout)
+        if pickled is not None:
+            financial_df, financial_raw_data, error_msg = pickled
+            financial_raw_data = financial_raw_data or {}
         else:
-            financial_df = None
+            # 兼容输出JSON的子进程：结果JSON包在哨兵行之间，直接在原始字节上按哨兵截取并解析
+            result = read_json(process.stdout)
             
-        financial_raw_data = result.get('raw_data', {})
-        error_msg = result.get('error') # Handles if key is missing or value is None
+            if result is None:
+                error_msg = f"无法从子进程输出中提取有效的结果数据。原始输出: {stdout_str[:200]}..."
+                financial_df, financial_raw_data = _get_fallback_financial_data()
+                return financial_df, financial_raw_data, error_msg
+
+            # dataframe 以 {'columns', 'index', 'data'} 字典的形式嵌在结果中，直接构造即可
+            financial_df = dataframe_from_payload(result.get('dataframe'))
+                
+            financial_raw_data = result.get('raw_data', {})
+            error_msg = result.get('error') # Handles if key is missing or value is None
 
         if financial_df is None and not error_msg:
              error_msg = f"从 {script_name} 未能获取 {stock_code} 的有效数据。"
@@ -172,29 +306,11 @@ def get_integrated_stock_details(stock_code, market_name):
     except subprocess.TimeoutExpired:
         error_msg = f"获取 {market_name} 财务数据超时"
         financial_df, financial_raw_data = _get_fallback_financial_data()
-    except (json.JSONDecodeError, KeyError) as e: # Removed CalledProcessError as we handle it manually
+    except (json.JSONDecodeError, pickle.UnpicklingError, KeyError) as e: # Removed CalledProcessError as we handle it manually
         error_msg = f"处理 {market_name} 财务数据子进程时出错: {e}"
         financial_df, financial_raw_data = _get_fallback_financial_data()
 
-
-    # 通过子进程获取新闻资讯，以隔离Playwright环境
-    news_data, news_error = _get_news_via_subprocess(stock_code)
-    if news_error:
-        # 如果财务数据部分没有错误，就用新闻部分的错误覆盖
-        if not error_msg:
-            error_msg = news_error
-
-    # A股URL在raw_data['comparison_data']['url']
-    # 港股URL在raw_data['url']
-    details_url = financial_raw_data.get('comparison_data', {}).get('url') or financial_raw_data.get('url')
-
-    return {
-        'financial_data': financial_df,
-        'financial_raw_data': financial_raw_data,
-        'error_msg': error_msg,
-        'news_data': news_data,
-        'details_url': details_url
-    }
+    return financial_df, financial_raw_data, error_msg
 
 def _get_news_via_subprocess(stock_code):
     """
@@ -202,22 +318,21 @@ def _get_news_via_subprocess(stock_code):
     :param stock_code: 股票代码
     :return: (list, str or None) 返回新闻列表和错误信息
     """
-    script_path = os.path.join("fetchers", "news_fetcher.py")
-    command = [sys.executable, script_path, stock_code]
+    command = [_PYEXE, "-m", _NEWS_MODULE, stock_code]
 
     try:
+        # stdout 保持原始字节，json.loads 直接解析UTF-8字节，不再先整体解码为 str
         process = subprocess.run(
             command,
             capture_output=True,
-            text=True,
-            encoding='utf-8',
             check=True,
-            timeout=60
+            timeout=60,
+            cwd=project_root
         )
         news_data = json.loads(process.stdout)
         return news_data, None
     except subprocess.CalledProcessError as e:
-        error_message = f"获取新闻子进程执行失败: {e.stderr}"
+        error_message = f"获取新闻子进程执行失败: {e.stderr.decode('utf-8', errors='replace')}"
         return [], error_message
     except (json.JSONDecodeError, FileNotFoundError) as e:
         error_message = f"处理新闻子进程时出错: {str(e)}"
@@ -236,7 +351,17 @@ def get_available_markets():
     """
     获取可用的市场选项
     """
-    return get_market_options()
+    return _MARKET_OPTIONS
+
+def _local_dates(seconds):
+    """
+    将秒级时间戳整列转换为本地日期字符串，format_news_for_display 和 format_news_markdown 共用。
+    :param seconds: pandas Series 数值时间戳
+    :return: pandas Series '%Y-%m-%d' 字符串，缺失、不大于0或超出范围的值为 NaN
+    """
+    # 0 或负数表示没有发布时间，不能显示成 1970-01-01，交给调用方的默认值处理
+    published = pd.to_datetime(seconds.where(seconds > 0), unit='s', utc=True, errors='coerce')
+    return published.dt.tz_convert(_LOCAL_TZ).dt.strftime('%Y-%m-%d')
 
 def format_news_for_display(news_list):
     """
@@ -245,30 +370,54 @@ def format_news_for_display(news_list):
     if not news_list:
         return "暂无相关新闻"
     
-    formatted_news = []
-    for news in news_list[:5]:  # 只显示前5条
-        # 东方财富网新闻数据字段: publishTime, title, url
-        if 'publishTime' in news:
-            # publishTime 是时间戳，需要转换
-            from datetime import datetime
-            date = datetime.fromtimestamp(news['publishTime']).strftime('%Y-%m-%d') if news.get('publishTime') else ''
-        else:
-            date = news.get('datetime', '').split(' ')[0] if news.get('datetime') else ''
-        
-        title = news.get('title', '无标题')
-        formatted_news.append(f"📰 {date} {title}")
-    
-    return '\n'.join(formatted_news)
+    # 只显示前5条，整列转换日期，不再逐条调用 datetime
+    df = pd.DataFrame(news_list[:5])
+    dates = pd.Series('', index=df.index)
+    if 'datetime' in df:
+        dates = df['datetime'].fillna('').astype(str).str.split(' ').str[0]
+    # 东方财富网新闻数据字段: publishTime, title, url
+    if 'publishTime' in df:
+        # publishTime 是时间戳，需要转换；没有时间戳的条目退回到 datetime 字段
+        dates = _local_dates(pd.to_numeric(df['publishTime'], errors='coerce')).fillna(dates)
+
+    titles = df['title'].fillna('无标题').astype(str) if 'title' in df else pd.Series('无标题', index=df.index)
+    return '\n'.join('📰 ' + dates + ' ' + titles)
+
+def format_news_markdown(news_list):
+    """
+    将新闻列表拼成一整段 Markdown，每条之间用分隔线隔开，页面只需调用一次 st.markdown。
+    日期整列转换；没有时间戳显示“未知日期”，时间戳不是数字显示“日期格式无效”，超出范围显示“日期解析错误”。
+    :param news_list: list of dict 包含 title、url、publishTime
+    :return: str，无新闻时返回空字符串
+    """
+    if not news_list:
+        return ""
+
+    df = pd.DataFrame(news_list)
+    empty = pd.Series([None] * len(df), index=df.index, dtype=object)
+    raw_time = df['publishTime'] if 'publishTime' in df else empty
+    has_time = raw_time.notna() & raw_time.astype(bool)
+    seconds = pd.to_numeric(raw_time.where(has_time), errors='coerce')
+    dates = (_local_dates(seconds)
+             .fillna('日期解析错误')
+             .mask(seconds.isna(), '日期格式无效')
+             .mask(~has_time, '未知日期'))
+
+    titles = (df['title'] if 'title' in df else empty).fillna('无标题新闻').astype(str)
+    urls = df['url'] if 'url' in df else empty
+    has_url = urls.notna() & urls.astype(bool)
+    lines = ('[' + titles + '](' + urls.where(has_url, '').astype(str) + ')').where(has_url, titles)
+    return '\n\n---\n\n'.join(lines + ' - *' + dates + '*')
 
 def format_financial_data_for_display(financial_df):
     """
-    格式化财务数据用于显示
+    格式化财务数据用于显示：以“指标”列作为索引，直接交给 st.dataframe 渲染，
+    不再先把整个表格转换成HTML字符串。
+    :return: pandas DataFrame，无数据时返回提示文字
     """
     if financial_df is None or financial_df.empty:
         return "无法获取财务数据"
-    
-    try:
-        # 将DataFrame转换为HTML表格，用于Streamlit显示
-        return financial_df.to_html(escape=False, table_id="financial_table")
-    except Exception as e:
-        return f"数据格式化错误: {str(e)}" 
\ No newline at end of file
+
+    if '指标' in financial_df.columns:
+        return financial_df.set_index('指标')
+    return financial_df
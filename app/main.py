@@ -1,13 +1,20 @@
+import os
+import logging
 import streamlit as st
 import pandas as pd
 from data_integrator import (
     get_integrated_market_data, 
+    clear_market_data_cache,
+    invalidate_stock_details,
     get_integrated_stock_details, 
     get_available_markets,
     format_news_for_display,
-    format_financial_data_for_display
+    format_news_markdown,
 )
 
+# 日志级别由 FC_LOGLEVEL 控制，设为 DEBUG 可查看抓取子进程的详细输出
+logging.basicConfig(level=os.getenv('FC_LOGLEVEL', 'INFO'))
+
 # 页面配置
 st.set_page_config(
     page_title="股票数据分析系统", 
@@ -29,21 +36,30 @@ def on_stock_select():
     This ensures the state is updated reliably from the widget's state.
     """
     selected_display = st.session_state.stock_selector
-    
-    # We need to reconstruct the options to find the code
-    df = get_integrated_market_data(st.session_state.market_selector)
-    if df is not None and not df.empty:
-        stock_codes = df['代码'].tolist()
-        stock_names = df['名称'].tolist()
-        stock_options = {f"{code} - {name}": code for code, name in zip(stock_codes, stock_names)}
-
-        if selected_display != "请选择..." and selected_display in stock_options:
-            st.session_state.selected_stock_code = stock_options[selected_display]
-            st.session_state.selected_stock_name = selected_display
-        else:
-            # Reset if "请选择..." is selected or if the selection is invalid
-            st.session_state.selected_stock_code = None
-            st.session_state.selected_stock_name = None
+
+    # 选项映射在页面渲染时已保存到 session_state，这里直接查找，不再重新获取排名数据
+    stock_options = st.session_state.get('_stock_options', {})
+    selected_code = stock_options.get(selected_display)
+
+    # "请选择..." 或无效的选择都不在映射中，此时重置选择
+    st.session_state.selected_stock_code = selected_code
+    st.session_state.selected_stock_name = selected_display if selected_code else None
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _build_stock_options(market):
+    """
+    由市场排名数据生成股票选择框的选项，按市场缓存，只有市场切换或缓存过期时才重新生成。
+    :param market: 市场名称
+    :return: (list, dict) -> (选择框的选项列表, {显示文本: 股票代码})
+    """
+    df = get_integrated_market_data(market)
+    if df is None or df.empty or not {'代码', '名称'}.issubset(df.columns):
+        return [], {}
+
+    codes = df['代码'].astype(str)
+    displays = (codes + ' - ' + df['名称'].astype(str)).tolist()
+    stock_options = dict(zip(displays, codes.tolist()))
+    return ["请选择..."] + list(stock_options), stock_options
 
 def reset_stock_selection():
     """Callback to reset stock selection when market changes."""
@@ -71,6 +87,9 @@ st.subheader(f"📋 {selected_market} 股票排名")
 if st.button("🔄 刷新数据", type="primary"):
     # Clear cache and reset selection
     st.cache_data.clear()
+    clear_market_data_cache()
+    if st.session_state.selected_stock_code:
+        invalidate_stock_details(st.session_state.selected_stock_code)
     st.session_state.selected_stock_code = None
     st.session_state.selected_stock_name = None
     st.rerun() # Rerun to reflect changes immediately
@@ -87,15 +106,15 @@ if df is not None and not df.empty:
     )
     
     # --- Stock Selector ---
-    stock_codes = df['代码'].tolist() if '代码' in df.columns else []
-    stock_names = df['名称'].tolist() if '名称' in df.columns else []
+    display_list, stock_options = _build_stock_options(selected_market)
     
-    if stock_codes and stock_names:
-        stock_options = {f"{code} - {name}": code for code, name in zip(stock_codes, stock_names)}
+    if stock_options:
+        # 供 on_stock_select 回调直接查找所选股票的代码
+        st.session_state._stock_options = stock_options
         
         selected_stock_display = st.selectbox(
             "选择股票查看详细信息：",
-            ["请选择..."] + list(stock_options.keys()),
+            display_list,
             key="stock_selector",
             on_change=on_stock_select
         )
@@ -128,7 +147,9 @@ if st.session_state.selected_stock_code:
     
     financial_data = details.get('financial_data')
     if financial_data is not None and not financial_data.empty:
-        st.table(financial_data.set_index('指标')) # Set index for better alignment
+        # financial_display 已在 data_integrator 中以“指标”为索引并随详情缓存；
+        # st.dataframe 直接传递 Arrow 数据，不在 Python 侧生成整张 HTML 表格
+        st.dataframe(details['financial_display'], use_container_width=True, hide_index=False)
     else:
         st.warning("暂无财务数据")
 
@@ -136,30 +157,8 @@ if st.session_state.selected_stock_code:
     st.markdown("#### 📰 最新资讯")
     news_data = details.get('news_data', [])
     if news_data:
-        for news in news_data:
-            # Format date and title for each news item
-            from datetime import datetime
-            try:
-                if 'publishTime' in news and news['publishTime']:
-                    # Added a check for numeric type to prevent crash
-                    if isinstance(news['publishTime'], (int, float)):
-                        date_str = datetime.fromtimestamp(news['publishTime']).strftime('%Y-%m-%d')
-                    else:
-                        date_str = "日期格式无效"
-                else:
-                    date_str = "未知日期"
-            except (ValueError, TypeError):
-                # Catch potential errors from fromtimestamp and handle them gracefully
-                date_str = "日期解析错误"
-
-            title = news.get('title', '无标题新闻')
-            # Assuming 'url' is a field in the news data
-            url = news.get('url') 
-            if url:
-                st.markdown(f"[{title}]({url}) - *{date_str}*")
-            else:
-                st.markdown(f"{title} - *{date_str}*")
-            st.divider()
+        # 所有新闻拼成一段 Markdown 一次性渲染，不再为每条新闻单独发送 markdown 和 divider 元素
+        st.markdown(format_news_markdown(news_data))
     else:
         st.info("暂无最新公司新闻")
 
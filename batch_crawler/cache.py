@@ -0,0 +1,144 @@
+"""
+抓取结果的磁盘缓存。
+
+财务详情和新闻一天之内基本不会变化，重复运行批量任务或在页面中反复查看同一只股票时，
+直接从缓存文件读取结果，省去重新启动页面抓取的开销。
+每条缓存是缓存目录下的一个文件，以文件的修改时间判断是否过期。
+"""
+import os
+import time
+import json
+import pickle
+import hashlib
+import tempfile
+from datetime import timedelta
+
+from .config import CACHE_DIR, DETAILS_CACHE_TTL_HOURS, NEWS_CACHE_TTL_HOURS
+
+
+class FileCache:
+    """
+    以文件保存字节数据的简单缓存，超过 ttl 的条目视为不存在。
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=timedelta(hours=DETAILS_CACHE_TTL_HOURS)):
+        """
+        :param cache_dir: 缓存文件存放的目录
+        :param ttl: timedelta 缓存有效期
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """
+        读取缓存。
+        :param key: 缓存键 (见 make_key)
+        :return: bytes or None (不存在或已过期)
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl.total_seconds():
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, data):
+        """
+        写入缓存。先写临时文件再替换，多个线程同时写同一个键也不会读到半截内容。
+        缓存目录在第一次写入时才创建，只导入模块不会在磁盘上留下目录。
+        :param key: 缓存键 (见 make_key)
+        :param data: bytes
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, key):
+        """
+        删除缓存，键不存在时忽略。
+        :param key: 缓存键 (见 make_key)
+        """
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+def make_key(fn_name, stock_code):
+    """
+    由抓取函数名和股票代码生成缓存键。
+    """
+    return hashlib.md5(f"{fn_name}:{stock_code}".encode()).hexdigest()
+
+
+DETAILS_CACHE = FileCache(os.path.join(CACHE_DIR, 'details'), timedelta(hours=DETAILS_CACHE_TTL_HOURS))
+NEWS_CACHE = FileCache(os.path.join(CACHE_DIR, 'news'), timedelta(hours=NEWS_CACHE_TTL_HOURS))
+
+
+def cached_details(fetch_fn, stock_code, cache=DETAILS_CACHE):
+    """
+    带缓存地调用详情 fetcher (get_stock_details / fetch_hk_stock_details)。
+    只缓存成功的结果，出错或没有数据时下次仍会重新抓取。
+    缓存文件损坏（例如写入时进程崩溃，或 pandas 版本变化后无法还原）时删除该条目并重新抓取。
+    :param fetch_fn: 返回 (DataFrame, dict, str or None) 的详情抓取函数
+    :param stock_code: 股票代码
+    :return: (DataFrame, dict, str or None) -> (财务数据, 原始数据, 错误信息)
+    """
+    key = make_key(fetch_fn.__name__, stock_code)
+    data = cache.get(key)
+    if data is not None:
+        try:
+            return pickle.loads(data)
+        except (pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError):
+            cache.delete(key)
+
+    result = fetch_fn(stock_code)
+    df, raw_data, error = result
+    if df is not None and raw_data and not error:
+        cache.set(key, pickle.dumps(result, protocol=5))
+    return result
+
+
+def invalidate(fetch_fn, stock_code, cache):
+    """
+    删除某个抓取函数对某只股票的缓存结果，下次调用时重新抓取。
+    :param fetch_fn: 抓取函数 (与 cached_details / cached_news 传入的相同)
+    :param stock_code: 股票代码
+    :param cache: 对应的 FileCache (DETAILS_CACHE 或 NEWS_CACHE)
+    """
+    cache.delete(make_key(fetch_fn.__name__, stock_code))
+
+
+def cached_news(fetch_fn, stock_code, cache=NEWS_CACHE):
+    """
+    带缓存地调用新闻 fetcher (get_company_news)，空列表不缓存；缓存文件损坏时删除该条目并重新抓取。
+    :param fetch_fn: 返回新闻字典列表的抓取函数
+    :param stock_code: 股票代码
+    :return: list
+    """
+    key = make_key(fetch_fn.__name__, stock_code)
+    data = cache.get(key)
+    if data is not None:
+        try:
+            return json.loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            cache.delete(key)
+
+    news_list = fetch_fn(stock_code)
+    if news_list:
+        cache.set(key, json.dumps(news_list, ensure_ascii=False).encode('utf-8'))
+    return news_list
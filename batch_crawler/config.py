@@ -10,12 +10,18 @@ DB_FILE = os.path.join(DB_DIR, 'financial_data.db')
 LOG_DIR = os.path.join(os.path.dirname(__file__), 'logs')
 LOG_FILE = os.path.join(LOG_DIR, 'crawler.log')
 
+# --- 缓存配置 ---
+# 抓取结果缓存目录
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '.cache')
+# 财务详情缓存有效期 (小时)，批量任务也不会重新抓取在此时间内更新过的股票
+DETAILS_CACHE_TTL_HOURS = 12
+# 新闻缓存有效期 (小时)
+NEWS_CACHE_TTL_HOURS = 1
+
 # --- 爬虫相关配置 ---
 # 全局超时设置 (秒)
 CRAWL_TIMEOUT = 60
-# 并发执行的进程数
-MAX_WORKERS = 3
-
-# 确保日志和数据库目录存在
-os.makedirs(DB_DIR, exist_ok=True)
-os.makedirs(LOG_DIR, exist_ok=True) 
\ No newline at end of file
+# 并发抓取的工作线程数（每个线程各自持有一个 Chromium 浏览器）
+MAX_WORKERS = 8
+# 每分钟最多开始抓取的股票数，由令牌桶控制
+REQUESTS_PER_MINUTE = 8
@@ -2,9 +2,11 @@ import sys
 import os
 import sqlite3
 import json
-import time
 import random
-from multiprocessing import Pool
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
 # 将项目根目录添加到Python路径中，以允许跨目录导入模块
@@ -13,13 +15,48 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # --- Fetcher函数直接导入 ---
-from fetchers.eastmoney_fetcher import get_market_options, crawl_stock_ranking_data
+from fetchers.eastmoney_fetcher import get_market_options, crawl_all_markets
 from fetchers.stock_details_fetcher import get_stock_details as get_a_share_details
 from fetchers.hk_details_fetcher import fetch_hk_stock_details as get_hk_share_details
 from fetchers.news_fetcher import get_company_news
 # --- 数据库和配置导入 ---
-from batch_crawler.db import get_db_connection
-from batch_crawler.config import MAX_WORKERS
+from batch_crawler.db import get_db_connection, transaction, create_tables
+from batch_crawler.config import MAX_WORKERS, REQUESTS_PER_MINUTE, DETAILS_CACHE_TTL_HOURS, LOG_DIR
+from batch_crawler.cache import cached_details, cached_news
+from batch_crawler.rate_limiter import TokenBucket
+
+# SQLite 同一时间只允许一个写入者，工作线程的入库操作通过这把锁串行执行
+_DB_WRITE_LOCK = threading.Lock()
+
+# 所有工作线程共用的限速器，控制每分钟开始抓取的股票数
+_RATE_LIMITER = TokenBucket(REQUESTS_PER_MINUTE, 60)
+
+
+def _acquire_once():
+    """
+    返回一个取令牌的函数：第一次调用时从限速器取一个令牌，之后的调用直接返回，
+    同一只股票的详情和新闻都需要抓取时只占用一个令牌。
+    """
+    taken = False
+
+    def acquire():
+        nonlocal taken
+        if not taken:
+            _RATE_LIMITER.acquire()
+            taken = True
+    return acquire
+
+
+def _with_token(fetch_fn, acquire):
+    """
+    包装抓取函数，只有缓存未命中、真正调用抓取函数时才先取令牌。
+    functools.wraps 保留原函数名，缓存键与直接传入抓取函数时相同。
+    """
+    @functools.wraps(fetch_fn)
+    def fetch(stock_code):
+        acquire()
+        return fetch_fn(stock_code)
+    return fetch
 
 
 def update_stock_list():
@@ -34,10 +71,12 @@ def update_stock_list():
     
     markets = get_market_options()
     total_inserted = 0
-    
+
+    print(f"正在并发获取 {len(markets)} 个市场的股票列表...")
+    market_data = crawl_all_markets(markets)
+
     for market_name, market_info in markets.items():
-        print(f"正在获取 '{market_name}' 的股票列表...")
-        df = crawl_stock_ranking_data(market_name)
+        df = market_data.get(market_name)
         
         if df is None or df.empty:
             print(f"未能获取到 '{market_name}' 的数据，跳过。")
@@ -48,67 +87,87 @@ def update_stock_list():
             print(f"警告: '{market_name}' 没有定义市场类型，跳过。")
             continue
         
-        insert_count_for_market = 0
-        for index, row in df.iterrows():
-            stock_code = row.get('代码')
-            stock_name = row.get('名称')
-            
-            if not stock_code or not stock_name:
-                continue
+        # 整列完成清洗和类型转换：先丢弃代码或名称缺失的行（避免把 NaN 存成 "nan"），
+        # 再剔除空字符串，剩下的行直接作为 executemany 的参数
+        rows_df = df[['代码', '名称']].dropna().astype(str)
+        rows_df = rows_df[(rows_df['代码'] != '') & (rows_df['名称'] != '')]
+        # itertuples(name=None) 直接产出原生元组，不为每行构造 Series
+        rows = rows_df.assign(market_type=market_type).itertuples(index=False, name=None)
 
-            try:
-                cursor.execute("""
+        insert_count_for_market = 0
+        try:
+            with transaction(conn):
+                cursor.executemany("""
                     INSERT OR IGNORE INTO stocks (stock_code, stock_name, market_type)
                     VALUES (?, ?, ?)
-                """, (stock_code, str(stock_name), market_type))
-                
-                if cursor.rowcount > 0:
-                    insert_count_for_market += 1
-
-            except sqlite3.Error as e:
-                print(f"数据库插入错误 (代码: {stock_code}): {e}")
+                """, rows)
+            # executemany 的 rowcount 是所有语句实际插入行数之和
+            insert_count_for_market = cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"数据库插入错误 (市场: {market_name}): {e}")
 
         total_inserted += insert_count_for_market
         print(f"'{market_name}' 处理完成。新增 {insert_count_for_market} 只股票到数据库。")
 
-    conn.commit()
-    conn.close()
-    
     print(f"\n股票列表更新完成。总共新增 {total_inserted} 只股票。")
 
 
 def fetch_and_save_stock_details(stock_info):
     """
     抓取单只股票的详细信息（财务、新闻）并存入数据库。
-    此版本在独立的进程中运行，以保证稳定性。
+    此函数在线程池的工作线程中运行，抓取时复用该线程自己的 Playwright 浏览器。
     """
     
     stock_code, market_type = stock_info
-    
-    details_success = False
-    news_success = False
 
     if stock_code.startswith('688'):
         return "skipped"
 
+    # 命中缓存的股票不占用令牌，续跑时已缓存的部分不受限速影响
+    acquire = _acquire_once()
+
     # 1. 抓取财务详情
     raw_data = None
     details_error = None
     if market_type == "A-Share":
-        _, raw_data, details_error = get_a_share_details(stock_code)
+        _, raw_data, details_error = cached_details(_with_token(get_a_share_details, acquire), stock_code)
     else: # HK-Share
-        _, raw_data, details_error = get_hk_share_details(stock_code)
+        _, raw_data, details_error = cached_details(_with_token(get_hk_share_details, acquire), stock_code)
     
     if details_error:
         print(f"抓取详情失败 (代码: {stock_code}): {details_error}", file=sys.stderr)
 
     # 2. 抓取新闻
-    news_result = get_company_news(stock_code)
+    news_result = cached_news(_with_token(get_company_news, acquire), stock_code)
 
     # 3. 数据入库
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with _DB_WRITE_LOCK:
+        details_success, news_success = _save_stock_details(stock_code, raw_data, details_error, news_result)
     
+    if details_success or news_success:
+        return "success"
+    else:
+        return "failed"
+
+def _save_stock_details(stock_code, raw_data, details_error, news_result):
+    """
+    将单只股票的财务数据和新闻在一个事务中写入数据库，使用当前线程缓存的连接。
+    调用方需持有 _DB_WRITE_LOCK；每只股票提交一次，写锁不会被某个线程长时间占住。
+    :return: (bool, bool) -> (财务数据是否入库成功, 是否有新闻入库)
+    """
+    conn = get_db_connection()
+    with transaction(conn):
+        details_success, news_success = _write_stock_details(conn.cursor(), stock_code, raw_data, details_error, news_result)
+
+    return details_success, news_success
+
+def _write_stock_details(cursor, stock_code, raw_data, details_error, news_result):
+    """
+    在已开启的事务中执行 _save_stock_details 的各条写入语句。
+    """
+    details_success = False
+    news_success = False
+
     if raw_data and not details_error:
         try:
             raw_data_json = json.dumps(raw_data, ensure_ascii=False)
@@ -120,77 +179,64 @@ def fetch_and_save_stock_details(stock_info):
             print(f"财务数据入库失败 (代码: {stock_code}): {e}", file=sys.stderr)
 
     if news_result:
-        news_inserted = 0
-        for news_item in news_result:
-            try:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO news (url, stock_code, title, publish_time)
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    news_item.get('url'),
-                    stock_code,
-                    news_item.get('title'),
-                    news_item.get('publishTime')
-                ))
-                if cursor.rowcount > 0:
-                    news_inserted += 1
-            except sqlite3.Error as e:
-                print(f"新闻入库失败 (URL: {news_item.get('url')}): {e}", file=sys.stderr)
-        
+        news_rows = [
+            (news_item.get('url'), stock_code, news_item.get('title'), news_item.get('publishTime'))
+            for news_item in news_result
+            if news_item.get('url')
+        ]
+        # 整批插入；total_changes 的差值即实际新增（未被 IGNORE）的行数
+        before = cursor.connection.total_changes
+        try:
+            cursor.executemany("""
+                INSERT OR IGNORE INTO news (url, stock_code, title, publish_time)
+                VALUES (?, ?, ?, ?)
+            """, news_rows)
+        except sqlite3.Error as e:
+            print(f"新闻入库失败 (代码: {stock_code}): {e}", file=sys.stderr)
+        news_inserted = cursor.connection.total_changes - before
+
         if news_inserted > 0:
             news_success = True
-    
-    conn.commit()
-    conn.close()
-    
-    if details_success or news_success:
-        return "success"
-    else:
-        return "failed"
+
+    return details_success, news_success
 
 def crawl_all_details():
     """
-    【最终版】从数据库中获取所有股票，并使用并发进程池抓取它们的详细信息。
+    【最终版】从数据库中获取所有股票，并使用线程池并发抓取它们的详细信息。
+    抓取以网络I/O为主，线程池省去了进程创建和参数/结果的 pickle 开销。
     【新增】断点续传功能。
+    最近 DETAILS_CACHE_TTL_HOURS 小时内已经更新过的股票不会重新抓取。
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    # 【核心优化】只选取尚未抓取过详情的股票，实现断点续传
+    # 【核心优化】只选取尚未抓取过、或最新一条详情已经过期的股票，实现断点续传
+    # 子查询直接走 financial_data 的主键索引，不需要先物化连接或分组结果
     cursor.execute("""
-        SELECT s.stock_code, s.market_type
-        FROM stocks s
-        LEFT JOIN financial_data fd ON s.stock_code = fd.stock_code
-        WHERE fd.stock_code IS NULL
-    """)
+        SELECT stock_code, market_type
+        FROM stocks
+        WHERE stock_code NOT IN (
+            SELECT stock_code FROM financial_data WHERE last_updated >= datetime('now', ?)
+        )
+    """, (f'-{DETAILS_CACHE_TTL_HOURS} hours',))
     all_stocks = cursor.fetchall()
-    conn.close()
 
     if not all_stocks:
-        print("数据库中没有股票，请先运行 update_stock_list()")
+        print("没有需要抓取详情的股票：数据库为空 (请先运行 update_stock_list()) 或所有股票都已是最新。")
         return
     
-    # 分批处理
-    batch_size = MAX_WORKERS
-    stock_batches = [all_stocks[i:i + batch_size] for i in range(0, len(all_stocks), batch_size)]
-
     print(f"准备开始为 {len(all_stocks)} 只股票抓取详细信息...")
-    print(f"将分 {len(stock_batches)} 批处理，每批最多 {batch_size} 只股票，批次间间隔60秒。")
+    print(f"使用 {MAX_WORKERS} 个工作线程，每分钟最多开始抓取 {REQUESTS_PER_MINUTE} 只股票。")
 
     total_results = []
     # 使用tqdm显示总进度
-    with tqdm(total=len(all_stocks), desc="抓取总进度") as pbar:
-        for i, batch in enumerate(stock_batches):
-            with Pool(processes=batch_size) as pool:
-                # 使用 imap_unordered，每完成一个任务就立即更新进度条
-                for result in pool.imap_unordered(fetch_and_save_stock_details, batch):
-                    total_results.append(result)
-                    pbar.update(1) # 进度条前进一步
-
-            # 在每批处理完成后，如果不是最后一批，则休息60秒
-            if i < len(stock_batches) - 1:
-                # 使用tqdm的write方法打印，避免与进度条冲突
-                pbar.write(f"\n第 {i+1}/{len(stock_batches)} 批处理完成，休息60秒...")
-                time.sleep(60)
+    # 所有股票一次性提交，由令牌桶限速，线程空出来就立刻开始下一只，不再整批等待
+    with tqdm(total=len(all_stocks), desc="抓取总进度") as pbar, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='crawler') as executor:
+        futures = [executor.submit(fetch_and_save_stock_details, stock_info) for stock_info in all_stocks]
+        # 使用 as_completed，每完成一个任务就立即更新进度条
+        for future in as_completed(futures):
+            total_results.append(future.result())
+            pbar.update(1) # 进度条前进一步
 
     # 打印最终的统计结果
     success_count = len([r for r in total_results if r == 'success'])
@@ -204,9 +250,13 @@ def main():
     批量抓取脚本的主入口。
     """
     print("--- 开始执行批量抓取任务 ---")
+    create_tables()
     update_stock_list()
     crawl_all_details()
     print("\n--- 批量抓取任务执行完毕 ---")
 
 if __name__ == '__main__':
+    # 日志目录只在批量任务启动时创建；数据库目录由 get_db_connection 创建
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(level=os.getenv('FC_LOGLEVEL', 'INFO'))
     main() 
\ No newline at end of file
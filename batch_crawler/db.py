@@ -2,19 +2,62 @@ import sqlite3
 import pandas as pd
 import os
 import sys
+import atexit
+import threading
+from contextlib import contextmanager
 
 # 使用相对导入，从同一个包中导入config模块
 from .config import DB_FILE, DB_DIR
 
+# 每个线程缓存一个连接，避免每只股票都重新打开数据库文件
+_local = threading.local()
+
 def get_db_connection():
     """
-    创建并返回一个到SQLite数据库的连接。
+    返回当前线程的SQLite数据库连接，首次调用时创建并缓存。
     如果数据库目录不存在，则会先创建该目录。
+    连接处于自动提交模式 (isolation_level=None)，批量写入请使用 transaction()。
+    调用方不要关闭返回的连接，需要时使用 close_db_connection()。
     """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        return conn
+
     os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    # WAL 模式下 synchronous=NORMAL 只在检查点时 fsync，写入开销大幅降低
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    _local.conn = conn
     return conn
 
+def close_db_connection():
+    """
+    关闭并丢弃当前线程缓存的数据库连接。
+    """
+    conn = getattr(_local, 'conn', None)
+    _local.conn = None
+    if conn is not None:
+        conn.close()
+
+# 工作线程的连接随线程结束被回收，主线程的连接在退出时关闭
+atexit.register(close_db_connection)
+
+@contextmanager
+def transaction(conn):
+    """
+    在一个显式事务中执行一组写操作：正常结束时提交，出现异常时回滚。
+    """
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
 def create_tables():
     """
     在数据库中创建所有需要的表 (如果它们还不存在的话)。
@@ -62,8 +105,12 @@ def create_tables():
     )
     ''')
 
-    conn.commit()
-    conn.close()
+    # crawl_all_details 的续传查询只需要 stocks 的这两列，覆盖索引让它不必回表
+    # financial_data 的主键 (stock_code, last_updated) 自带索引，已能满足按代码和更新时间的查找
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_stocks_code_type ON stocks (stock_code, market_type)
+    ''')
+
     print("数据库表创建成功或已存在。")
 
 if __name__ == '__main__':
@@ -0,0 +1,41 @@
+"""
+批量抓取使用的令牌桶限速器。
+
+取代原先“抓一批、休息60秒”的做法：工作线程每抓取一只股票前取一个令牌，
+令牌按固定速率补充，线程池始终保持满负荷，同时整体请求速率不超过上限。
+"""
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶。桶满时最多允许 capacity 次突发请求，之后每 period 秒补充 capacity 个令牌。
+    """
+
+    def __init__(self, capacity, period):
+        """
+        :param capacity: 桶容量，即每个周期允许的请求数
+        :param period: 补满一桶令牌所需的秒数
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        取出一个令牌，桶空时阻塞到补充出新令牌为止。
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            # 在锁外等待，其他线程仍可同时计算各自的等待时间
+            time.sleep(wait)
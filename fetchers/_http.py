@@ -0,0 +1,65 @@
+"""
+所有 fetcher 共用的 HTTP 会话。
+
+排名接口、新闻接口和新闻搜索页都是东方财富的域名，统一通过同一个 requests.Session 发出：
+只维护一个连接池，每个域名的长连接在不同 fetcher、Streamlit 的多次重跑之间复用，
+重试策略也只在这里配置一次。各 fetcher 只在请求时传入自己的 Referer。
+"""
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
+
+# 各 fetcher 请求时使用的 (连接超时, 读超时) 秒数
+REQUEST_TIMEOUT = (3.05, 10)
+
+# 与下面的 Retry 配置对应：一个请求最多发出 3 次（连接失败或 5xx 时重试），两次重试之间的退避合计约 0.6 秒
+_MAX_ATTEMPTS = 3
+_MAX_BACKOFF = 0.6
+
+
+def _build_session():
+    """
+    创建共享的 requests.Session：连接池保持长连接，服务端临时错误时自动重试。
+    pool_connections 按域名数估算，pool_maxsize 覆盖两个市场和新闻分页的并发请求。
+    读超时不重试，连接失败或 5xx 最多重试两次。这只能限制单个请求的耗时，
+    需要在截止时间前完成的一连串请求（例如新闻抓取的各级退回）用 timeout_within 为每个请求计算超时。
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, read=0, connect=2, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504))
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+SESSION = _build_session()
+
+
+def timeout_within(deadline):
+    """
+    计算一个请求的 (连接超时, 读超时)，使它连同重试和退避在内在 deadline 之前结束。
+    剩余时间平均分给最多 _MAX_ATTEMPTS 次尝试，每次不超过 REQUEST_TIMEOUT。
+    :param deadline: time.monotonic() 时间点
+    :return: (float, float)，剩余时间不足以发出请求时返回 None
+    """
+    per_attempt = (deadline - time.monotonic() - _MAX_BACKOFF) / _MAX_ATTEMPTS
+    if per_attempt <= 0:
+        return None
+    connect = min(REQUEST_TIMEOUT[0], per_attempt / 4)
+    read = min(REQUEST_TIMEOUT[1], per_attempt - connect)
+    return connect, read
+
+
+def close_session():
+    """
+    关闭共享会话持有的所有连接。
+    """
+    SESSION.close()
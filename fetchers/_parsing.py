@@ -0,0 +1,40 @@
+"""
+各 fetcher 共用的 HTML 解析和数据类型工具。
+
+页面解析直接使用 lxml 和 XPath，不经过 BeautifulSoup 的 Python 层树遍历；
+文本提取的结果与 BeautifulSoup 的 get_text(strip=True) 保持一致。
+"""
+from lxml import etree, html as lxml_html
+
+# 显示用的字符串列优先使用 pyarrow 存储（Streamlit 已依赖 pyarrow），
+# 每个单元格不再是一个独立的 Python str 对象；没有 pyarrow 时退回普通的 string 类型
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+_TEXT_NODES = etree.XPath('.//text()')
+
+
+def parse_html(html_content):
+    """
+    用 lxml 解析整页或页面片段的HTML。
+    :param html_content: str 或 bytes
+    :return: lxml 根元素，内容为空或无法解析时返回 None
+    """
+    if not html_content or not html_content.strip():
+        return None
+    try:
+        return lxml_html.document_fromstring(html_content)
+    except etree.ParserError:
+        return None
+
+
+def node_text(element):
+    """
+    提取元素文本：每段文本去除首尾空白后直接拼接，与 get_text(strip=True) 一致。
+    :param element: lxml 元素
+    :return: str
+    """
+    return ''.join(text.strip() for text in _TEXT_NODES(element))
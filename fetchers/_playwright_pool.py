@@ -0,0 +1,164 @@
+"""
+进程内共享的 Playwright 浏览器。
+
+Playwright 的同步 API 对象只能在创建它的线程内使用，因此每个线程持有一个 PlaywrightPool：
+同一线程内的多次抓取复用同一个 Chromium 进程和同一个 context，每次调用通过 acquire()/release()
+借还一个 page，省去了每只股票都重新启动 Playwright 驱动和浏览器的开销，连接和 DNS 缓存也在多次调用之间保持。
+长时间运行的 Chromium 内存会逐渐增长，因此浏览器累计打开 MAX_USES 个 page 后会被关闭，下次使用时重新启动。
+"""
+import atexit
+import threading
+
+from playwright.sync_api import sync_playwright
+
+_local = threading.local()
+
+# 一个浏览器最多打开的 page 数，达到后在归还 page 时关闭浏览器
+MAX_USES = 50
+
+# 抓取只需要 DOM 和脚本，图片、字体、媒体和样式表的请求直接中止，减少下载量并加快页面加载
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media', 'stylesheet'})
+
+# 无界面抓取用不到的浏览器功能；/dev/shm 在容器中通常很小，改用临时目录
+LAUNCH_ARGS = ['--disable-gpu', '--disable-dev-shm-usage', '--mute-audio', '--disable-extensions']
+
+
+def _block_resources(route):
+    """
+    context 级别的路由处理函数，中止 BLOCKED_RESOURCE_TYPES 中的请求，其余照常发出。
+    """
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+
+class PlaywrightPool:
+    """
+    一个线程内的 Playwright 驱动、Chromium 浏览器和共享 context，均在首次使用时才启动。
+    """
+
+    def __init__(self, max_uses=MAX_USES):
+        """
+        :param max_uses: 浏览器累计打开多少个 page 后重新启动
+        """
+        self.max_uses = max_uses
+        self._uses = 0
+        self._playwright = None
+        self._browser = None
+        self._context = None
+
+    @property
+    def browser(self):
+        """
+        返回浏览器；如果浏览器已断开（例如崩溃），会自动重新启动，并丢弃旧的 context。
+        :return: playwright.sync_api.Browser
+        """
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        self._context = None
+        self._uses = 0
+        return self._browser
+
+    @property
+    def context(self):
+        """
+        返回共享的 context，调用方不要关闭它。
+        :return: playwright.sync_api.BrowserContext
+        """
+        browser = self.browser
+        if self._context is None:
+            self._context = self._new_context(browser)
+        return self._context
+
+    @staticmethod
+    def _new_context(browser):
+        """
+        新建一个屏蔽了非必要资源的 context。
+        """
+        context = browser.new_context()
+        context.route('**/*', _block_resources)
+        return context
+
+    def acquire(self, isolated=False):
+        """
+        借出一个 page，用完后必须调用 release() 归还。
+        :param isolated: 为 True 时在共享的浏览器中新建一个独立的 context，
+                         cookie 和本地存储不与其他调用共享，归还时连同 context 一起关闭
+        :return: playwright.sync_api.Page
+        """
+        if isolated:
+            page = self._new_context(self.browser).new_page()
+        else:
+            page = self.context.new_page()
+        self._uses += 1
+        return page
+
+    def release(self, page):
+        """
+        归还 acquire() 借出的 page 并将其关闭；浏览器已达到 max_uses 时一并关闭浏览器。
+        :param page: acquire() 返回的 page
+        """
+        try:
+            if page.context is self._context:
+                page.close()
+            else:
+                page.context.close()
+        finally:
+            if self._uses >= self.max_uses:
+                self._recycle_browser()
+
+    def _recycle_browser(self):
+        """
+        关闭当前浏览器和共享 context，Playwright 驱动保留，下次访问 browser 时重新启动。
+        """
+        browser = self._browser
+        self._browser = self._context = None
+        self._uses = 0
+        if browser is not None and browser.is_connected():
+            browser.close()
+
+    def close(self):
+        """
+        关闭 context、浏览器并停止 Playwright 驱动。
+        """
+        context, browser, playwright = self._context, self._browser, self._playwright
+        self._context = self._browser = self._playwright = None
+
+        try:
+            if browser is not None and browser.is_connected():
+                if context is not None:
+                    context.close()
+                browser.close()
+        finally:
+            if playwright is not None:
+                playwright.stop()
+
+
+def get_pool():
+    """
+    返回当前线程的 PlaywrightPool，首次调用时创建。
+    :return: PlaywrightPool
+    """
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = PlaywrightPool()
+    return pool
+
+
+def close_pool():
+    """
+    关闭当前线程的 PlaywrightPool。
+    """
+    pool = getattr(_local, 'pool', None)
+    _local.pool = None
+    if pool is not None:
+        pool.close()
+
+
+# 其他线程的驱动进程会随主进程退出一起结束，这里只需清理主线程的实例
+atexit.register(close_pool)
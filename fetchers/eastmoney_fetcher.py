@@ -1,7 +1,12 @@
 import requests
 import json
+import logging
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from fetchers._http import REQUEST_TIMEOUT, SESSION, USER_AGENT
+from fetchers._parsing import STRING_DTYPE
 
 # -- 市场配置 --
 MARKET_OPTIONS = {
@@ -25,6 +30,43 @@ MARKET_OPTIONS = {
     }
 }
 
+# --- 请求参数模板 ---
+# 各市场的请求地址和参数在导入时一次性生成，每次调用直接复用
+_PARAMS_A = {
+    "cb": "jQuery112405034891155096131_1589169999999",
+    "pn": "1", "pz": "500", "np": "1",
+    "ut": "bd1d9ddb040897001ac3b38159e2164a",
+    "fltt": "2", "invt": "2",
+    "wbp2u": "||0|0|0|web", "fid": "f3", "po": "0",
+}
+# Parameters for HK-Share (based on user-provided script)
+_PARAMS_HK = {
+    "pn": "1", "pz": "50000", "po": "1", "np": "2",
+    "ut": "bd1d9ddb04089700cf9c27f6f7426281",
+    "fltt": "2", "invt": "2", "dect": "1",
+    "wbp2u": "|0|0|0|web", "fid": "f3",
+}
+_REQUESTS = {
+    name: (
+        "http://push2.eastmoney.com/api/qt/clist/get" if cfg["type"] == "A-Share"
+        else "https://69.push2.eastmoney.com/api/qt/clist/get",
+        {
+            **(_PARAMS_A if cfg["type"] == "A-Share" else _PARAMS_HK),
+            "fs": cfg["fs"],
+            "fields": ",".join(cfg["columns"]),
+        },
+    )
+    for name, cfg in MARKET_OPTIONS.items()
+}
+
+# 请求和响应的调试信息只在 DEBUG 级别输出 (入口处由 FC_LOGLEVEL 配置)
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Referer": "https://quote.eastmoney.com/"
+}
+
 def crawl_stock_ranking_data(market_name):
     """
     从东方财富网获取股票排名数据
@@ -35,74 +77,44 @@ def crawl_stock_ranking_data(market_name):
     market_config = MARKET_OPTIONS[market_name]
     is_ashare = market_config["type"] == "A-Share"
 
-    if is_ashare:
-        # --- Parameters for A-Share ---
-        url = "http://push2.eastmoney.com/api/qt/clist/get"
-        params = {
-            "cb": "jQuery112405034891155096131_1589169999999",
-            "pn": "1", "pz": "500", "np": "1",
-            "ut": "bd1d9ddb040897001ac3b38159e2164a",
-            "fltt": "2", "invt": "2",
-            "wbp2u": "||0|0|0|web", "fid": "f3", "po": "0",
-            "fs": market_config["fs"],
-            "fields": ",".join(market_config["columns"].keys())
-        }
-    else:
-        # --- Parameters for HK-Share (based on user-provided script) ---
-        url = "https://69.push2.eastmoney.com/api/qt/clist/get"
-        params = {
-            "pn": "1", "pz": "50000", "po": "1", "np": "2",
-            "ut": "bd1d9ddb04089700cf9c27f6f7426281",
-            "fltt": "2", "invt": "2", "dect": "1",
-            "wbp2u": "|0|0|0|web", "fid": "f3",
-            "fs": market_config["fs"],
-            "fields": ",".join(market_config["columns"].keys())
-        }
-        
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36",
-        "Referer": "https://quote.eastmoney.com/"
-    }
+    url, params = _REQUESTS[market_name]
 
     # --- Debugging Block for ALL markets ---
-    import urllib.parse
-    full_url = f"{url}?{urllib.parse.urlencode(params)}"
-    print(f"\n--- [DEBUG] {market_name} Request ---")
-    print(f"Market Type: {market_config['type']}")
-    print(f"Requesting URL: {full_url}")
-    print(f"Request Headers: {headers}")
-    print("------------------------------\n")
+    if logger.isEnabledFor(logging.DEBUG):
+        import urllib.parse
+        logger.debug("%s request: type=%s, url=%s?%s, headers=%s",
+                     market_name, market_config['type'], url, urllib.parse.urlencode(params), HEADERS)
 
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        
-        print(f"\n--- [DEBUG] {market_name} Response ---")
-        print(f"Response Status Code: {response.status_code}")
-        print(f"Response Text (first 1000 chars): {response.text[:1000]}")
-        print("-------------------------------\n")
-        
+        response = SESSION.get(url, params=params, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+
+        # 截取响应文本需要先解码整段响应，只在确实输出时才做
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s response: status=%s, text (first 1000 chars)=%s",
+                         market_name, response.status_code, response.text[:1000])
+
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
-        print(f"\n--- [DEBUG] {market_name} Request ERROR ---\n{e}\n------------------------------------\n")
+        logger.error("%s request failed: %s", market_name, e)
         return None
 
     # --- Data Parsing ---
+    # 直接在响应的原始字节上定位和解析，json.loads 接受UTF-8字节，省去把整段响应解码成 str
     try:
+        content = response.content
         if is_ashare:
             # A-Share uses JSONP, requires stripping the callback
-            jsonp_data = response.text
-            start = jsonp_data.find('(')
-            end = jsonp_data.rfind(')')
+            start = content.find(b'(')
+            end = content.rfind(b')')
             if start != -1 and end != -1:
-                json_str = jsonp_data[start+1:end]
-                data = json.loads(json_str)
+                data = json.loads(content[start+1:end])
             else:
-                raise json.JSONDecodeError("Invalid JSONP format", jsonp_data, 0)
+                raise json.JSONDecodeError("Invalid JSONP format", content.decode('utf-8', errors='replace'), 0)
         else:
             # HK-Share returns pure JSON
-            data = response.json()
+            data = json.loads(content)
     except json.JSONDecodeError as e:
-        print(f"JSON parsing failed with error: {e}")
+        logger.error("JSON parsing failed with error: %s", e)
         return None
 
     # --- Data Extraction ---
@@ -110,46 +122,46 @@ def crawl_stock_ranking_data(market_name):
     diff_data = data.get("data", {}).get("diff")
 
     if not diff_data:
-        print("No stock data found in response")
+        logger.warning("No stock data found in response (%s)", market_name)
         return pd.DataFrame()
 
     if is_ashare:
         # A-share data is a list of dictionaries
         stock_list = diff_data
     else:
-        # HK-share data is a dictionary of dictionaries, needs to be transposed
-        df_temp = pd.DataFrame.from_dict(diff_data, orient='index')
-        stock_list = df_temp.to_dict('records')
-
-    print(f"Parsed data keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
-    print(f"Stock list length: {len(stock_list)}")
-    if stock_list:
-        print(f"First stock sample: {stock_list[0]}")
-    print("-------------------------------\n")
-
-    df = pd.DataFrame(stock_list)
-    df = df.rename(columns=market_config["columns"])
+        # HK-share data is a dictionary of dictionaries ({序号: {字段}})，
+        # 直接取出各行字典，与A股共用下面同一次 DataFrame 构造，不再先转置再转回 records
+        stock_list = list(diff_data.values())
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Parsed data keys: %s", list(data.keys()) if isinstance(data, dict) else 'Not a dict')
+        logger.debug("Stock list length: %d, first stock sample: %s", len(stock_list), stock_list[0] if stock_list else None)
+
+    # 按配置中的字段顺序直接取值，并以中文列名构造 DataFrame，
+    # 省去之后的 rename，响应中多余的字段也不会进入 DataFrame
+    fields = market_config["columns"]
+    df = pd.DataFrame(
+        [[row.get(field) for field in fields] for row in stock_list],
+        columns=list(fields.values())
+    )
 
     # Refactored Data Formatting Block
     # 1. Convert all potential numeric columns to numeric type first, coercing errors
-    for col_name in df.columns:
-        if col_name not in ['代码', '名称']:
-            df[col_name] = pd.to_numeric(df[col_name], errors='coerce')
+    # 所有数值列一次性转换，不再逐列循环
+    num_cols = df.columns.difference(['代码', '名称'], sort=False)
+    df[num_cols] = df[num_cols].apply(pd.to_numeric, errors='coerce')
 
     # 2. Apply special formatting for volume and turnover and rename columns
+    # pop 取出原列后直接生成新列，省去 drop(inplace=True) 的额外拷贝
     if "成交量(手)" in df.columns:
-        df["成交量(万手)"] = (df["成交量(手)"] / 10000).round(2)
-        df.drop(columns=["成交量(手)"], inplace=True)
+        df["成交量(万手)"] = df.pop("成交量(手)").div(10_000).round(2)
     if "成交额" in df.columns:
-        df["成交额(亿)"] = (df["成交额"] / 100_000_000).round(2)
-        df.drop(columns=["成交额"], inplace=True)
+        df["成交额(亿)"] = df.pop("成交额").div(100_000_000).round(2)
     # Handle HK stocks for completeness
     if "成交量(股)" in df.columns:
-        df["成交量(万股)"] = (df["成交量(股)"] / 10000).round(2)
-        df.drop(columns=["成交量(股)"], inplace=True)
+        df["成交量(万股)"] = df.pop("成交量(股)").div(10_000).round(2)
     if "成交额(港元)" in df.columns:
-        df["成交额(亿港元)"] = (df["成交额(港元)"] / 100_000_000).round(2)
-        df.drop(columns=["成交额(港元)"], inplace=True)
+        df["成交额(亿港元)"] = df.pop("成交额(港元)").div(100_000_000).round(2)
 
     # 3. Reorder columns for better readability
     if market_name == "沪深京A股":
@@ -171,13 +183,26 @@ def crawl_stock_ranking_data(market_name):
         df = df[existing_columns]
 
     # 4. Finally, convert all non-identifier columns to string for safe display
-    for col_name in df.columns:
-        if col_name not in ['代码', '名称']:
-            df[col_name] = df[col_name].astype(str).replace('nan', '-')
+    # 缺失值在 string 类型下是 <NA>，统一显示为 '-'
+    str_cols = df.columns.difference(['代码', '名称'], sort=False)
+    df[str_cols] = df[str_cols].astype(STRING_DTYPE).fillna('-')
 
     return df
 
 
+def crawl_all_markets(market_names=None):
+    """
+    并发获取多个市场的股票排名数据，请求都在等待网络I/O，总耗时约等于最慢的一个市场。
+    :param market_names: 市场名称列表，默认为全部市场
+    :return: dict {市场名称: DataFrame or None}
+    """
+    names = list(MARKET_OPTIONS) if market_names is None else list(market_names)
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='market') as executor:
+        return dict(zip(names, executor.map(crawl_stock_ranking_data, names)))
+
+
 def get_market_options():
     """
     返回可用的市场选项
@@ -1,16 +1,27 @@
 import pandas as pd
-from playwright.sync_api import sync_playwright
 import time
-import sys
 import re 
-from bs4 import BeautifulSoup # FIX: Move import to top level
+from lxml import etree
 
-def fetch_hk_stock_details(stock_code: str):
+from fetchers._parsing import parse_html, node_text
+from fetchers._playwright_pool import get_pool
+from fetchers.ipc import IPC_FORMATS, write_result
+
+# 解析表格元数据用的正则，导入时编译一次
+_TRAIL_DIGITS = re.compile(r'\d+$')
+_INDUSTRY_PREFIX = re.compile(r'^(.*?)\(行业平均\)')
+
+# 表格数据行及其单元格的 XPath，导入时编译一次；没有单元格的空行直接在 XPath 中过滤掉
+_DATA_ROWS = etree.XPath('.//tbody//tr[td]')
+_ROW_CELLS = etree.XPath('.//td')
+
+def fetch_hk_stock_details(stock_code: str, page=None):
     """
     从东方财富网抓取指定港股的详细财务数据，使用Playwright来处理动态加载的内容。
 
     Args:
         stock_code (str): 港股代码 (例如: '00700').
+        page: 可选，由调用方管理的 Playwright page；默认在当前线程共享的 context 中新建一个，用完即关闭。
 
     Returns:
         tuple: (DataFrame | None, dict | None, str | None) -> (财务数据, 原始数据, 错误信息)
@@ -20,15 +31,17 @@ def fetch_hk_stock_details(stock_code: str):
         
     url = f"https://quote.eastmoney.com/hk/{stock_code}.html"
     
-    with sync_playwright() as p:
+    try:
+        own_page = page is None
+        if own_page:
+            page = get_pool().acquire()
         try:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(url, wait_until='load', timeout=30000)
+            # 服务器开始响应即返回，后面的等待条件已经保证表格数据就绪，不必等整页的 load 事件
+            page.goto(url, wait_until='commit', timeout=30000)
 
-            # 等待关键的财务数据表格出现
+            # 等待关键的财务数据表格出现在 DOM 中
             finance_div_selector = 'div.finance4'
-            page.wait_for_selector(finance_div_selector, timeout=20000)
+            page.wait_for_selector(f"{finance_div_selector} table tbody tr", timeout=20000, state='attached')
             
             # 等待表格内的数据加载完成
             page.wait_for_function(f"""
@@ -40,52 +53,50 @@ def fetch_hk_stock_details(stock_code: str):
 
             finance_div = page.locator(finance_div_selector)
             html_content = finance_div.inner_html()
-            browser.close()
-
-            parsed_data, error_message = _parse_hk_financial_table(html_content)
+        finally:
+            if own_page:
+                get_pool().release(page)
 
-            if error_message:
-                return None, None, error_message
-                
-            df = pd.DataFrame(parsed_data['all_rows'], columns=parsed_data['headers'])
-            # 【核心修复】返回元组，与其他fetcher保持一致
-            return df, parsed_data, None
+        parsed_data, error_message = _parse_hk_financial_table(html_content)
 
-        except Exception as e:
-            error_message = f"使用 Playwright 抓取或解析港股 {stock_code} 数据时发生错误: {e}"
-            # 【核心修复】返回元组，与其他fetcher保持一致
+        if error_message:
             return None, None, error_message
+            
+        df = pd.DataFrame(parsed_data['all_rows'], columns=parsed_data['headers'])
+        # 【核心修复】返回元组，与其他fetcher保持一致
+        return df, parsed_data, None
+
+    except Exception as e:
+        error_message = f"使用 Playwright 抓取或解析港股 {stock_code} 数据时发生错误: {e}"
+        # 【核心修复】返回元组，与其他fetcher保持一致
+        return None, None, error_message
 
 def _parse_hk_financial_table(html_content):
     """
     解析抓取到的港股财务表格HTML。
     """
-    if not html_content:
+    root = parse_html(html_content)
+    if root is None:
         return None, "抓取到的HTML内容为空"
-        
-    soup = BeautifulSoup(html_content, 'lxml')
-    table = soup.find('table')
+    table = root.find('.//table')
     
-    if not table:
+    if table is None:
         return None, "在抓取到的内容中未能找到 <table> 标签"
 
     # 1. 解析表头，并修正第一列的列名
-    headers = [th.get_text(strip=True) for th in table.select('thead th')]
+    headers = [node_text(th) for th in table.xpath('.//thead//th')]
     if headers and headers[0] == '':
         headers[0] = '指标'
 
     # 2. 解析所有数据行
     all_rows = []
-    data_rows = table.select('tbody tr')
+    # 数据行只查询一次，既用于判断表格是否为空，也用于逐行解析
+    data_rows = _DATA_ROWS(table)
     if not data_rows:
         return None, "数据表格中没有找到任何数据行"
 
     for tr in data_rows:
-        cells = tr.select('td')
-        if not cells:
-            continue # 跳过没有单元格的空行
-
-        row_data = [td.get_text(strip=True) for td in cells]
+        row_data = [node_text(td) for td in _ROW_CELLS(tr)]
 
         # 检查行数据和表头长度是否匹配
         if len(row_data) == len(headers):
@@ -97,12 +108,12 @@ def _parse_hk_financial_table(html_content):
     if all_rows:
         # 公司名称通常在第一行的第一列
         company_name_raw = all_rows[0][0]
-        company_name = re.sub(r'\d+$', '', company_name_raw).strip()
+        company_name = _TRAIL_DIGITS.sub('', company_name_raw).strip()
         
         # 行业名称在第二行
         if len(all_rows) > 1:
             industry_name_raw = all_rows[1][0]
-            match = re.search(r'^(.*?)\(行业平均\)', industry_name_raw)
+            match = _INDUSTRY_PREFIX.search(industry_name_raw)
             industry_name = match.group(1) if match else industry_name_raw
 
     parsed_data = {
@@ -116,23 +127,20 @@ def _parse_hk_financial_table(html_content):
 
 if __name__ == '__main__':
     # 为了让这个脚本可以被 data_integrator 通过 subprocess 调用，
-    # 我们将结果序列化为JSON并打印到标准输出。
-    if len(sys.argv) > 1:
-        stock_code_arg = sys.argv[1]
+    # 我们将结果序列化后写到标准输出：默认为JSON，--ipc=pickle 时为 pickle 帧。
+    import argparse
+
+    parser = argparse.ArgumentParser(description="获取指定港股的核心财务指标。")
+    parser.add_argument("stock_code", nargs='?', help="要查询的港股代码；省略时运行测试模式")
+    parser.add_argument("--ipc", choices=IPC_FORMATS, default="json",
+                        help="结果输出格式：json 便于人工查看，pickle 供 data_integrator 读取")
+    args = parser.parse_args()
+
+    if args.stock_code:
         # 【核心修复】按元组格式接收返回值
-        df, raw_data, error = fetch_hk_stock_details(stock_code_arg)
-        
-        output = {
-            'dataframe': None,
-            'raw_data': raw_data or {}, # 如果raw_data是None，则使用空字典
-            'error': error
-        }
-        
-        if df is not None:
-            output['dataframe'] = df.to_json(orient='split', force_ascii=False)
-            
-        import json
-        print(json.dumps(output, ensure_ascii=False))
+        df, raw_data, error = fetch_hk_stock_details(args.stock_code)
+        # 结果按 --ipc 指定的格式输出，JSON 包在哨兵行之间，便于父进程从混杂的调试输出中直接定位
+        write_result(df, raw_data, error, args.ipc)
     else:
         # --- 原有的直接运行测试代码 ---
         print("Running in test mode. To fetch a stock, provide its code as an argument.")
@@ -0,0 +1,203 @@
+"""
+子进程模式 (FC_ISOLATE=1) 下，详情 fetcher 与 data_integrator 之间的输出约定。
+
+子进程的 stdout 中可能混有调试输出，因此结果前面总是带有哨兵，
+父进程直接定位哨兵截取结果，不必逐字符扫描整段输出。
+支持两种格式：
+- json: 结果JSON前后各加一行哨兵，便于人工直接运行脚本时查看；
+- pickle: 哨兵后跟8字节长度前缀和 pickle 数据，data_integrator 使用这种格式，
+  DataFrame 原样传回，省去JSON编解码和类型推断。
+"""
+import json
+import pickle
+import subprocess
+import sys
+import threading
+
+import pandas as pd
+
+JSON_BEGIN = b'---JSON-BEGIN---'
+JSON_END = b'---JSON-END---'
+PICKLE_BEGIN = b'---PICKLE-BEGIN---'
+
+IPC_FORMATS = ('json', 'pickle')
+
+# 读取子进程管道时每次读取的字节数
+_CHUNK_SIZE = 64 * 1024
+
+
+def write_json(payload):
+    """
+    将结果序列化为UTF-8编码的JSON，包在哨兵行之间写入 stdout。
+    DataFrame 中可能混有 numpy 标量、时间戳等非JSON原生类型，这些值按字符串输出。
+    :param payload: 结果字典
+    """
+    encoded = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+    sys.stdout.flush()
+    sys.stdout.buffer.write(JSON_BEGIN + b'\n' + encoded + b'\n' + JSON_END + b'\n')
+    sys.stdout.buffer.flush()
+
+
+def write_pickle(df, raw_data, error):
+    """
+    将 (DataFrame, 原始数据, 错误信息) 以长度前缀的 pickle 帧写入 stdout。
+    """
+    body = pickle.dumps((df, raw_data, error), protocol=5)
+    sys.stdout.flush()
+    sys.stdout.buffer.write(PICKLE_BEGIN + len(body).to_bytes(8, 'big') + body)
+    sys.stdout.buffer.flush()
+
+
+def write_result(df, raw_data, error, ipc='json'):
+    """
+    按 ipc 指定的格式输出详情 fetcher 的结果，A股和港股脚本共用同一个结果约定：
+    {'dataframe': ..., 'raw_data': ..., 'error': ...}，出错时同样正常输出，错误信息放在 error 中。
+    :param df: pandas DataFrame or None
+    :param raw_data: dict or None
+    :param error: str or None
+    :param ipc: 'json' 或 'pickle'
+    """
+    raw_data = raw_data or {}
+    if ipc == 'pickle':
+        # DataFrame 原样 pickle 传回父进程，省去JSON编解码
+        write_pickle(df, raw_data, error)
+    else:
+        write_json({
+            'dataframe': dataframe_to_payload(df) if df is not None else None,
+            'raw_data': raw_data,
+            'error': error
+        })
+
+
+def read_pickle(stdout_bytes):
+    """
+    从子进程的原始 stdout 中读取 write_pickle 写出的结果。
+    :param stdout_bytes: 子进程 stdout 的原始字节
+    :return: (DataFrame, dict, str or None) 或 None（没有完整的 pickle 帧）
+    """
+    start = stdout_bytes.find(PICKLE_BEGIN)
+    if start == -1:
+        return None
+    start += len(PICKLE_BEGIN)
+    size = int.from_bytes(stdout_bytes[start:start + 8], 'big')
+    body = stdout_bytes[start + 8:start + 8 + size]
+    if len(body) != size:
+        return None
+    return pickle.loads(body)
+
+
+def text_output(stdout_bytes):
+    """
+    返回 stdout 中 pickle 帧之前的文本部分（即子进程的调试输出）。
+    """
+    return stdout_bytes.split(PICKLE_BEGIN, 1)[0]
+
+
+def read_json(stdout_bytes):
+    """
+    从子进程的原始 stdout 中截取并解析结果JSON，全程在字节上操作，不解码整段输出。
+    没有哨兵时（例如旧版本的脚本），退回到第一个 '{' 与最后一个 '}' 之间的内容。
+    :param stdout_bytes: 子进程 stdout 的原始字节
+    :return: dict or None
+    :raises json.JSONDecodeError: 截取到的内容不是合法的JSON
+    """
+    start = stdout_bytes.rfind(JSON_BEGIN)
+    if start != -1:
+        start += len(JSON_BEGIN)
+        end = stdout_bytes.find(JSON_END, start)
+        if end != -1:
+            return json.loads(stdout_bytes[start:end])
+
+    start = stdout_bytes.find(b'{')
+    end = stdout_bytes.rfind(b'}')
+    if start == -1 or end < start:
+        return None
+    return json.loads(stdout_bytes[start:end + 1])
+
+
+def dataframe_to_payload(df):
+    """
+    将 DataFrame 转为可直接嵌入结果JSON的字典，父进程无需再做第二次JSON解析。
+    :param df: pandas DataFrame
+    :return: dict 包含 columns、index、data
+    """
+    return {'columns': df.columns.tolist(), 'index': df.index.tolist(), 'data': df.values.tolist()}
+
+
+def dataframe_from_payload(payload):
+    """
+    由 dataframe_to_payload 生成的字典重建 DataFrame。
+    :param payload: dict or None
+    :return: pandas DataFrame or None
+    """
+    if not payload:
+        return None
+    return pd.DataFrame(**payload)
+
+
+def run_fetcher(command, timeout, cwd=None):
+    """
+    运行 fetcher 子进程，并在它运行期间由后台线程持续读取 stdout/stderr。
+    一旦 stdout 中出现完整的结果（pickle 帧或JSON结束哨兵），就不再等待子进程
+    自行完成 Playwright 和解释器的清理，直接将其终止。
+    :param command: 子进程命令行
+    :param timeout: 等待结果的最长秒数
+    :param cwd: 子进程的工作目录
+    :return: subprocess.CompletedProcess，stdout/stderr 为原始字节
+    :raises subprocess.TimeoutExpired: 超时仍未得到结果
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0, cwd=cwd)
+    stdout_buf = bytearray()
+    stderr_buf = bytearray()
+    payload_ready = threading.Event()
+
+    def drain_stdout():
+        frame_start = -1
+        for chunk in iter(lambda: process.stdout.read(_CHUNK_SIZE), b''):
+            # 只在新数据附近查找哨兵，避免每次都重新扫描整个缓冲区
+            scan_from = max(0, len(stdout_buf) - len(PICKLE_BEGIN))
+            stdout_buf.extend(chunk)
+            if payload_ready.is_set():
+                continue
+            if frame_start == -1:
+                frame_start = stdout_buf.find(PICKLE_BEGIN, scan_from)
+            if frame_start != -1:
+                if _frame_complete(stdout_buf, frame_start):
+                    payload_ready.set()
+            elif stdout_buf.find(JSON_END, scan_from) != -1:
+                payload_ready.set()
+        # 子进程关闭 stdout（通常是已退出）时同样结束等待
+        payload_ready.set()
+
+    def drain_stderr():
+        for chunk in iter(lambda: process.stderr.read(_CHUNK_SIZE), b''):
+            stderr_buf.extend(chunk)
+
+    readers = [threading.Thread(target=drain_stdout, daemon=True), threading.Thread(target=drain_stderr, daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    if not payload_ready.wait(timeout):
+        process.kill()
+        process.wait()
+        raise subprocess.TimeoutExpired(command, timeout, output=bytes(stdout_buf), stderr=bytes(stderr_buf))
+
+    if process.poll() is None:
+        # 结果已经完整读到，剩下的只是子进程的清理工作
+        process.terminate()
+    process.wait()
+    for reader in readers:
+        reader.join()
+
+    return subprocess.CompletedProcess(command, process.returncode, bytes(stdout_buf), bytes(stderr_buf))
+
+
+def _frame_complete(buf, frame_start):
+    """
+    判断从 frame_start 开始的 pickle 帧是否已经完整写入缓冲区。
+    """
+    body_start = frame_start + len(PICKLE_BEGIN) + 8
+    if len(buf) < body_start:
+        return False
+    size = int.from_bytes(buf[body_start - 8:body_start], 'big')
+    return len(buf) >= body_start + size
@@ -1,106 +1,280 @@
 import json
-from bs4 import BeautifulSoup
+import os
+import re
+from lxml import etree
 from datetime import datetime
-from playwright.sync_api import sync_playwright
 import sys
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-def get_company_news(stock_code, max_pages=1):
+import requests
+
+from fetchers._http import SESSION, USER_AGENT, timeout_within
+from fetchers._parsing import parse_html, node_text
+from fetchers._playwright_pool import get_pool
+
+NEWS_SEARCH_URL = "https://so.eastmoney.com/news/s"
+# 搜索页通过这个JSONP接口加载新闻列表，直接请求它即可拿到结构化的结果
+NEWS_API_URL = "https://search-api-web.eastmoney.com/search/jsonp"
+NEWS_API_PAGE_SIZE = 10
+
+# 搜索接口查询参数中固定不变的部分，每次请求只填入关键词和页码
+_API_QUERY = {
+    "uid": "",
+    "type": ["cmsArticleWebOld"],
+    "client": "web",
+    "clientType": "web",
+    "clientVersion": "curr",
+}
+_API_PAGE_QUERY = {
+    "searchScope": "default", "sort": "time",
+    "pageSize": NEWS_API_PAGE_SIZE,
+    "preTag": "<em>", "postTag": "</em>"
+}
+_API_JSON_SEPARATORS = (',', ':')
+
+# 解析新闻列表用的 XPath，导入时编译一次，每页复用
+# 只选取同时带有标题链接和时间的新闻条目；链接和时间都取条目内的第一个
+_NEWS_ITEMS = etree.XPath(
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' news_item ')]"
+    "[.//div[contains(concat(' ', normalize-space(@class), ' '), ' news_item_t ')]//a]"
+    "[.//span[contains(concat(' ', normalize-space(@class), ' '), ' news_item_time ')]]"
+)
+_ITEM_LINK = etree.XPath("(.//div[contains(concat(' ', normalize-space(@class), ' '), ' news_item_t ')]//a)[1]")
+_ITEM_TIME = etree.XPath("(.//span[contains(concat(' ', normalize-space(@class), ' '), ' news_item_time ')])[1]")
+
+# 接口返回的标题中用 <em> 高亮关键词
+_HIGHLIGHT_TAG = re.compile(r'</?em>')
+
+# 页面上新闻时间的格式；时间是本地时间，转换时间戳时按系统时区规则解释
+NEWS_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 设置 FC_NEWS_PLAYWRIGHT=1 时跳过HTTP请求，始终使用 Playwright 抓取
+USE_PLAYWRIGHT_NEWS = os.environ.get('FC_NEWS_PLAYWRIGHT') == '1'
+
+# 一次新闻抓取（接口、HTML、Playwright 依次尝试）总共允许的秒数。
+# 低于 data_integrator 的 NEWS_FETCH_TIMEOUT (30 秒)，页面放弃等待时抓取线程也已经空出来
+NEWS_FETCH_DEADLINE = 25
+
+class _DeadlineExceeded(Exception):
+    """新闻抓取用完了 NEWS_FETCH_DEADLINE。"""
+
+HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Referer": "https://so.eastmoney.com/"
+}
+
+def get_company_news(stock_code, max_pages=1, page=None):
     """
-    从东方财富网搜索接口抓取最新的公司资讯，通过模拟点击“下一页”实现翻页。
+    从东方财富网搜索结果页抓取最新的公司资讯。
+    默认直接请求搜索页背后的JSON接口，不启动浏览器；接口请求失败或格式不符时改为请求各页的HTML解析。
+    接口正常返回但没有新闻时直接返回空列表，不再尝试其他方式。两者都失败、传入了 page 或设置了 FC_NEWS_PLAYWRIGHT=1 时，
+    才退回到 Playwright，各页在同一个 context 的多个标签页中同时加载。
     :param stock_code: 股票代码
     :param max_pages: 要抓取的最大页数
+    :param page: 可选，由调用方管理的Playwright page；默认在当前线程共享的浏览器中
+                 新建一个独立的 context，搜索页的 cookie 和状态不会带到下一次调用
+    整个抓取过程（包括各级退回）在 NEWS_FETCH_DEADLINE 秒内结束，超时后返回空列表。
+    :return: list of news articles or an empty list
+    """
+    deadline = time.monotonic() + NEWS_FETCH_DEADLINE
+    if page is None and not USE_PLAYWRIGHT_NEWS:
+        for fetch in (_get_news_via_api, _get_news_via_http):
+            articles = fetch(stock_code, max_pages, deadline)
+            if articles is not None:
+                return articles
+    return _get_news_via_playwright(stock_code, max_pages, page, deadline)
+
+def _request_timeout(deadline):
+    """
+    返回下一个请求可用的 (连接超时, 读超时)；已经来不及发出请求时抛出 _DeadlineExceeded。
+    """
+    timeout = timeout_within(deadline)
+    if timeout is None:
+        raise _DeadlineExceeded(f"news fetch exceeded {NEWS_FETCH_DEADLINE}s")
+    return timeout
+
+def _remaining_ms(deadline, limit_ms):
+    """
+    返回 Playwright 操作可用的毫秒数，不超过 limit_ms；已经没有剩余时间时抛出 _DeadlineExceeded。
+    """
+    remaining_ms = int((deadline - time.monotonic()) * 1000)
+    if remaining_ms <= 0:
+        raise _DeadlineExceeded(f"news fetch exceeded {NEWS_FETCH_DEADLINE}s")
+    return min(limit_ms, remaining_ms)
+
+def _get_news_via_api(stock_code, max_pages, deadline):
+    """
+    逐页请求搜索接口，返回的JSONP中直接包含标题、链接和时间，不需要解析HTML。
+    :param deadline: time.monotonic() 截止时间，见 get_company_news
+    :return: list of news articles（没有新闻时为空列表），或 None（请求失败或接口格式不符，需要换用其他方式）
+    """
+    titles, urls, time_strs = [], [], []
+    # 页面传入的代码已经是字符串，只有批量任务等调用方传入其他类型时才转换
+    keyword = stock_code if isinstance(stock_code, str) else str(stock_code)
+    try:
+        for page_num in range(1, max_pages + 1):
+            query = {**_API_QUERY, "keyword": keyword,
+                     "param": {"cmsArticleWebOld": {**_API_PAGE_QUERY, "pageIndex": page_num}}}
+            params = {"cb": "jQuery", "param": json.dumps(query, separators=_API_JSON_SEPARATORS)}
+            response = SESSION.get(NEWS_API_URL, params=params, headers=HEADERS, timeout=_request_timeout(deadline))
+            response.raise_for_status()
+
+            # 去掉JSONP的回调函数包装: jQuery({...})
+            body = response.content
+            payload = json.loads(body[body.index(b'(') + 1:body.rindex(b')')])
+            items = payload['result']['cmsArticleWebOld']
+            if not items:
+                break
+            for item in items:
+                titles.append(_HIGHLIGHT_TAG.sub('', item['title']))
+                urls.append(item['url'])
+                time_strs.append(item['date'])
+            if len(items) < NEWS_API_PAGE_SIZE:
+                break
+    except (requests.exceptions.RequestException, _DeadlineExceeded, ValueError, KeyError, TypeError) as e:
+        print(f"[WARN] News API request failed, falling back to HTML: {e}", file=sys.stderr)
+        return None
+
+    return _build_articles(titles, urls, time_strs)
+
+def _get_news_via_http(stock_code, max_pages, deadline):
+    """
+    直接请求各页搜索结果的HTML并解析，各页之间互不依赖，因此并发请求。
+    :param deadline: time.monotonic() 截止时间，见 get_company_news
+    :return: list of news articles，或 None（第一页没有解析出新闻，需要退回 Playwright）
+    """
+    def fetch_page(page_num):
+        params = {"keyword": stock_code, "sort": "time", "pageindex": page_num}
+        response = SESSION.get(NEWS_SEARCH_URL, params=params, headers=HEADERS, timeout=_request_timeout(deadline))
+        response.raise_for_status()
+        return _parse_news_items(response.content)
+
+    try:
+        first_page = fetch_page(1)
+        if not first_page:
+            return None
+        if max_pages <= 1:
+            return first_page
+        with ThreadPoolExecutor(max_workers=min(max_pages - 1, 4), thread_name_prefix='news') as executor:
+            other_pages = list(executor.map(fetch_page, range(2, max_pages + 1)))
+    except (requests.exceptions.RequestException, _DeadlineExceeded) as e:
+        print(f"[WARN] HTTP news request failed, falling back to Playwright: {e}", file=sys.stderr)
+        return None
+
+    all_articles = list(first_page)
+    for articles in other_pages:
+        # 超出最后一页时返回的列表为空，后面的页也不会再有内容
+        if not articles:
+            break
+        all_articles.extend(articles)
+    return all_articles
+
+def _parse_news_items(html_content):
+    """
+    从搜索结果页（或其中的新闻列表）HTML中解析新闻条目。
+    :param html_content: str 或 bytes
+    :return: list of dict 包含 title、url、publishTime
+    """
+    root = parse_html(html_content)
+    if root is None:
+        return []
+
+    items = _NEWS_ITEMS(root)
+    links = [_ITEM_LINK(item)[0] for item in items]
+    titles = [node_text(link) for link in links]
+    urls = [link.get('href') for link in links]
+    time_strs = [node_text(_ITEM_TIME(item)[0]).replace(' -', '').strip() for item in items]
+
+    return _build_articles(titles, urls, time_strs)
+
+def _build_articles(titles, urls, time_strs):
+    """
+    由并列的标题、链接和时间字符串列表生成新闻条目，无法解析时间的条目丢弃。
+    :return: list of dict 包含 title、url、publishTime
+    """
+    articles = []
+    for title, news_url, time_str in zip(titles, urls, time_strs):
+        publish_time = _parse_news_time(time_str)
+        if publish_time is not None:
+            articles.append({"title": title, "url": news_url, "publishTime": publish_time})
+    return articles
+
+def _parse_news_time(time_str):
+    """
+    将 NEWS_TIME_FORMAT 格式的本地时间转换为时间戳。
+    格式固定，直接按位置切片取各字段，不经过 strptime 的格式串解释；格式不符时才退回 strptime。
+    :param time_str: 如 '2024-01-02 09:30:00'
+    :return: int 时间戳，无法解析时返回 None
+    """
+    try:
+        if (len(time_str) == 19 and time_str[4] == time_str[7] == '-' and time_str[10] == ' '
+                and time_str[13] == time_str[16] == ':'):
+            published = datetime(int(time_str[0:4]), int(time_str[5:7]), int(time_str[8:10]),
+                                 int(time_str[11:13]), int(time_str[14:16]), int(time_str[17:19]))
+        else:
+            published = datetime.strptime(time_str, NEWS_TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    # naive datetime 的 timestamp() 按系统时区在该时刻的规则（包括夏令时）换算
+    return int(published.timestamp())
+
+def _get_news_via_playwright(stock_code, max_pages, page=None, deadline=None):
+    """
+    使用 Playwright 打开搜索结果页。各页的地址由 pageindex 直接确定，
+    因此在同一个 context 中为每一页开一个标签页，先依次发起导航，浏览器并行加载，
+    再逐页等待新闻列表并解析，不再模拟点击“下一页”等待内容变化。
+    浏览器在调用之间复用，每次调用使用独立的 context，用完即关闭。
+    各步的超时都不超过 deadline 的剩余时间，到点后返回已经解析出的新闻。
+    :param deadline: time.monotonic() 截止时间，默认从现在起 NEWS_FETCH_DEADLINE 秒
     :return: list of news articles or an empty list
     """
+    if deadline is None:
+        deadline = time.monotonic() + NEWS_FETCH_DEADLINE
     all_articles = []
-    # 脚本执行时，禁止打印任何非JSON内容到stdout，以确保输出纯净
-    # print(f"--- 正在抓取第 {page_num} 页 ---")
-    
+    news_list_selector = "div.news_list"
+
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context()
-            page = context.new_page()
-
-            # 初始导航到第一页
-            url = f"https://so.eastmoney.com/news/s?keyword={stock_code}&sort=time&pageindex=1"
-            page.goto(url, timeout=30000, wait_until='domcontentloaded')
-
-            for page_num in range(1, max_pages + 1):
-                # print(f"--- 正在抓取第 {page_num} 页 ---")
-                
-                # 等待新闻列表容器加载完成
-                news_list_selector = "div.news_list"
+        # 前面的 HTTP 尝试已经用完时间时，不再借用浏览器
+        if time.monotonic() >= deadline:
+            raise _DeadlineExceeded(f"news fetch exceeded {NEWS_FETCH_DEADLINE}s")
+        own_page = page is None
+        if own_page:
+            page = get_pool().acquire(isolated=True)
+        pages = [page]
+        try:
+            # 第一页使用传入（或借到）的 page，其余页在同一个 context 中新开
+            pages.extend(page.context.new_page() for _ in range(max_pages - 1))
+            # goto 等到服务器开始响应就返回，各页的加载在浏览器中同时进行
+            for page_num, tab in enumerate(pages, start=1):
+                url = f"{NEWS_SEARCH_URL}?keyword={stock_code}&sort=time&pageindex={page_num}"
+                tab.goto(url, timeout=_remaining_ms(deadline, 30000), wait_until='commit')
+
+            for tab in pages:
+                # 等待新闻列表容器加载完成；某一页没有列表说明已超过最后一页
                 try:
-                    page.wait_for_selector(news_list_selector, timeout=20000)
+                    tab.wait_for_selector(news_list_selector, timeout=_remaining_ms(deadline, 20000), state='attached')
                 except Exception:
-                    # print(f"第 {page_num} 页没有找到新闻列表，抓取结束。")
                     break
-                
-                # 获取第一条新闻的标题，用于之后判断页面是否已更新
-                first_item_selector = 'div.news_item:first-child div.news_item_t a'
-                first_item_on_page = page.locator(f'{news_list_selector} {first_item_selector}')
-                
+
+                # 容器出现后只短暂等待第一条新闻，没有结果的页面不必等满容器的超时
                 try:
-                    # 等待第一个新闻项可见
-                    first_item_on_page.wait_for(timeout=5000)
+                    tab.wait_for_selector(f'{news_list_selector} div.news_item', timeout=_remaining_ms(deadline, 5000),
+                                          state='attached')
                 except Exception:
-                     # print("当前页没有新闻或新闻列表不可见，抓取结束。")
-                     break
-                
-                old_first_title = first_item_on_page.inner_text()
-
-                html_content = page.locator(news_list_selector).inner_html()
-                soup = BeautifulSoup(html_content, 'lxml')
-                news_items = soup.select('div.news_item')
-                
-                for item in news_items:
-                    title_tag = item.select_one('div.news_item_t a')
-                    time_tag = item.select_one('span.news_item_time')
-
-                    if title_tag and time_tag:
-                        title = title_tag.get_text(strip=True)
-                        news_url = title_tag.get('href')
-                        time_str = time_tag.get_text(strip=True).replace(' -', '').strip()
-
-                        try:
-                            dt_object = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
-                            timestamp = int(dt_object.timestamp())
-                        except ValueError:
-                            continue
-
-                        all_articles.append({
-                            "title": title,
-                            "url": news_url,
-                            "publishTime": timestamp
-                        })
-
-                # 如果不是要抓取的最后一页，则进行翻页
-                if page_num < max_pages:
-                    next_page_button_selector = 'div.c_pager a[title="下一页"]'
-                    next_button = page.locator(next_page_button_selector)
-                    
-                    if next_button.is_visible():
-                        try:
-                            next_button.click()
-                            # 等待内容更新：判断第一条新闻的标题是否已经改变
-                            page.wait_for_function("""
-                                (oldTitle) => {
-                                    const el = document.querySelector('div.news_list div.news_item:first-child div.news_item_t a');
-                                    if (!el) return true; // 列表消失也是一种变化
-                                    return el.innerText !== oldTitle;
-                                }
-                            """, arg=old_first_title, timeout=15000)
-                        except Exception as e:
-                            # print(f"翻到下一页时超时或发生错误，抓取结束: {e}")
-                            break
-                    else:
-                        # print("找不到'下一页'按钮，抓取结束。")
-                        break
-            
-            context.close()
-            browser.close()
-        
+                    break
+
+                articles = _parse_news_items(tab.locator(news_list_selector).inner_html())
+                if not articles:
+                    break
+                all_articles.extend(articles)
+        finally:
+            for tab in pages[1:]:
+                tab.close()
+            if own_page:
+                get_pool().release(page)
+
         return all_articles
 
     except Exception as e:
@@ -119,8 +293,9 @@ def main():
 
     news_list = get_company_news(args.stock_code, max_pages=args.pages)
     
-    # 将结果以JSON格式打印到stdout
-    print(json.dumps(news_list, ensure_ascii=False))
+    # 将结果以UTF-8编码的JSON直接写入stdout的字节缓冲区，父进程也按字节解析
+    sys.stdout.buffer.write(json.dumps(news_list, ensure_ascii=False).encode('utf-8') + b'\n')
+    sys.stdout.buffer.flush()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
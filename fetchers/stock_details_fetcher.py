@@ -1,7 +1,19 @@
 import pandas as pd
 import re
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from fetchers._parsing import STRING_DTYPE, parse_html, node_text
+from fetchers._playwright_pool import get_pool
+
+# 解析表格元数据和识别股票代码用的正则，导入时编译一次
+_FULL_CODE = re.compile(r'^(SH|SZ|BJ)\d{6}$')
+_TRAIL_DIGITS = re.compile(r'\d+$')
+_INDUSTRY_PREFIX = re.compile(r'^(.*?)\(行业平均\)')
+
+# 股票代码前缀对应的交易所，按前缀长度从长到短查表
+_EXCHANGE_BY_PREFIX3 = {'688': 'SH', '689': 'SH'}
+_EXCHANGE_BY_PREFIX2 = {'60': 'SH', '00': 'SZ', '30': 'SZ'}
+_EXCHANGE_BY_PREFIX1 = {'8': 'BJ', '4': 'BJ'}
 
 # The compatibility fix for asyncio on Windows has been moved to the main application
 # entry point (e.g., your Streamlit app's main .py file). It must be placed at the
@@ -9,11 +21,12 @@ from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeo
 
 # --- Main Function ---
 
-def get_stock_details(stock_code):
+def get_stock_details(stock_code, page=None):
     """
     通过Playwright，从东方财富网抓取个股的动态财务数据。
     如果抓取或解析失败，返回一个包含N/A的空DataFrame及错误信息。
     :param stock_code: 股票代码，如 '301123'
+    :param page: 可选，由调用方管理的Playwright page；默认在当前线程共享的 context 中新建一个
     :return: (DataFrame, dict, str or None) -> (摘要数据, 原始数据, 错误信息)
     """
     # 定义一个表示失败的、结构一致的返回值
@@ -22,7 +35,7 @@ def get_stock_details(stock_code):
 
     full_code = get_full_stock_code(stock_code)
     
-    scraped_data, error = _scrape_financial_analysis_with_playwright(full_code)
+    scraped_data, error = _scrape_financial_analysis_with_playwright(full_code, page)
 
     if error:
         return na_df, empty_raw_data, error
@@ -31,7 +44,12 @@ def get_stock_details(stock_code):
         return na_df, empty_raw_data, "未能从页面解析出完整的财务数据表格"
 
     # 成功后，创建DataFrame和原始数据
-    df = pd.DataFrame(scraped_data['all_rows'], columns=scraped_data['headers'])
+    # 按列组装后一次性构造，所有列直接指定为字符串类型，不再逐行推断类型；较短的行缺失的单元格补为空值
+    # 列先按位置编号，构造后再设置表头，重复的表头（例如多个空的期间列）各自保留为独立的列
+    all_rows = scraped_data['all_rows']
+    headers = scraped_data['headers']
+    columns = [[row[i] if i < len(row) else None for row in all_rows] for i in range(len(headers))]
+    df = pd.DataFrame(dict(enumerate(columns)), dtype=STRING_DTYPE).set_axis(headers, axis=1)
     
     raw_data = {
         'stock_name': scraped_data.get('company_name', stock_code),
@@ -42,9 +60,10 @@ def get_stock_details(stock_code):
 
 # --- Private Scraping and Parsing Functions ---
 
-def _scrape_financial_analysis_with_playwright(full_code):
+def _scrape_financial_analysis_with_playwright(full_code, page=None):
     """
     使用Playwright访问页面，等待JS动态加载财务数据表格后抓取。
+    浏览器和 context 在调用之间复用，每次只新建一个 page。
     """
     url = ""
     # 根据股票代码规则（特别是科创板）构建正确的URL
@@ -59,26 +78,31 @@ def _scrape_financial_analysis_with_playwright(full_code):
     print(f"正在访问A股URL: {url}")
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
-            page.goto(url, timeout=30000, wait_until='domcontentloaded')
+        own_page = page is None
+        if own_page:
+            page = get_pool().acquire()
+        try:
+            # 服务器开始响应即返回，不等待页面上第三方脚本触发的 DOMContentLoaded
+            page.goto(url, timeout=30000, wait_until='commit')
 
             # 最终正确的选择器，基于您提供的源码
             table_container_selector = "div.finance4"
-            page.wait_for_selector(table_container_selector, timeout=20000)
+            # 只需要表格行出现在 DOM 中，不要求可见
+            page.wait_for_selector(f"{table_container_selector} table tbody tr", timeout=20000, state='attached')
             
             # [FIX 1] Add a hard delay to wait for dynamic content to be loaded.
             page.wait_for_timeout(2000)
 
             table_html = page.locator(table_container_selector).inner_html()
-            browser.close()
-            
-            parsed_data, error = _parse_financial_table_html(table_html)
-            # 将URL添加到解析成功的数据中，以便向上传递
-            if parsed_data:
-                parsed_data['url'] = url
-            return parsed_data, error
+        finally:
+            if own_page:
+                get_pool().release(page)
+
+        parsed_data, error = _parse_financial_table_html(table_html)
+        # 将URL添加到解析成功的数据中，以便向上传递
+        if parsed_data:
+            parsed_data['url'] = url
+        return parsed_data, error
 
     except PlaywrightTimeoutError as e:
         return None, f"页面加载或元素定位超时。未能在页面上动态加载出财务数据表格 ('div.finance4')。错误: {e}"
@@ -89,53 +113,43 @@ def _parse_financial_table_html(html_content):
     """
     解析抓取到的财务表格HTML，智能处理特殊行，确保数据纯净。
     """
-    if not html_content:
+    root = parse_html(html_content)
+    if root is None:
         return None, "抓取到的HTML内容为空"
-        
-    soup = BeautifulSoup(html_content, 'lxml')
-    table = soup.find('table')
-    
-    if not table:
+
+    tables = root.xpath('//table')
+    if not tables:
         return None, "在抓取到的内容中未能找到 <table> 标签"
+    table = tables[0]
 
     # 1. 解析表头
     headers = ['指标']
-    header_tags = table.find('thead').find_all('th')
-    for th in header_tags:
-        header_text = th.get_text(strip=True).replace('?', '')
+    for th in table.xpath('.//thead//th'):
+        header_text = node_text(th).replace('?', '')
         if header_text:
             headers.append(header_text)
 
     # 2. 智能解析所有数据行
     all_rows = []
-    data_rows = table.find('tbody').find_all('tr')
+    data_rows = table.xpath('.//tbody//tr')
     if not data_rows:
         return None, "数据表格中没有找到任何数据行"
 
     for tr in data_rows:
-        row_data = []
-        cells = tr.find_all('td')
-        
         # 对包含提示的特殊行（四分位属性行）进行净化处理
-        if 'fw4tr' in tr.get('class', []):
-            for td in cells:
-                # 移除内部的提示div，避免提取到不必要的帮助文字
-                tip_div = td.find('div', class_='tip')
-                if tip_div:
-                    tip_div.decompose()
-                row_data.append(td.get_text(strip=True))
-        else:
-            # 普通行直接提取
-            row_data = [td.get_text(strip=True) for td in cells]
-            
-        all_rows.append(row_data)
+        if 'fw4tr' in tr.classes:
+            # 移除内部的提示div，避免提取到不必要的帮助文字；drop_tree 会保留其后的文本
+            for tip_div in tr.xpath(".//td//div[contains(concat(' ', normalize-space(@class), ' '), ' tip ')]"):
+                tip_div.drop_tree()
+
+        all_rows.append([node_text(td) for td in tr.xpath('.//td')])
 
     # 3. 提取元数据
     company_name_raw = all_rows[0][0] if len(all_rows) > 0 else "未知公司"
-    company_name = re.sub(r'\d+$', '', company_name_raw).strip()
+    company_name = _TRAIL_DIGITS.sub('', company_name_raw).strip()
     
     industry_name_raw = all_rows[1][0] if len(all_rows) > 1 else "未知行业"
-    match = re.search(r'^(.*?)\(行业平均\)', industry_name_raw)
+    match = _INDUSTRY_PREFIX.search(industry_name_raw)
     industry_name = match.group(1) if match else industry_name_raw
 
     parsed_data = {
@@ -150,17 +164,16 @@ def _parse_financial_table_html(html_content):
 def get_full_stock_code(stock_code):
     """根据A股股票代码前缀生成完整的股票代码"""
     code_str = str(stock_code).strip().upper()
-    if re.match(r'^(SH|SZ|BJ)\d{6}$', code_str):
+    if _FULL_CODE.match(code_str):
         return code_str
-    if code_str.startswith(('60', '688', '689')):
-        return f"SH{code_str}"
-    if code_str.startswith(('00', '30')):
-        return f"SZ{code_str}"
-    if code_str.startswith(('8', '4')):
-        return f"BJ{code_str}"
+    exchange = (_EXCHANGE_BY_PREFIX3.get(code_str[:3])
+                or _EXCHANGE_BY_PREFIX2.get(code_str[:2])
+                or _EXCHANGE_BY_PREFIX1.get(code_str[:1]))
+    if exchange:
+        return f"{exchange}{code_str}"
     if len(code_str) == 6:
-        if code_str.startswith(('60','68')): return f"SH{code_str}"
-        return f"SZ{code_str}"
+        # 其他6位代码：68 开头归上交所，其余归深交所
+        return f"SH{code_str}" if code_str[:2] == '68' else f"SZ{code_str}"
     raise ValueError(f"无法识别的股票代码格式: {stock_code}")
 
 # --- Test Function (Removed) ---
@@ -178,34 +191,20 @@ if __name__ == '__main__':
     """
     This block makes the script runnable from the command line.
     It takes a stock code as an argument, fetches the data,
-    and prints the results as a JSON object to stdout.
+    and prints the results to stdout (JSON by default, or a pickle frame with --ipc=pickle).
     This allows it to be called from a separate process, avoiding event loop conflicts.
     """
-    import sys
-    import json
+    import argparse
+    from fetchers.ipc import IPC_FORMATS, write_result
 
-    if len(sys.argv) < 2:
-        # Print an error as JSON to stderr
-        print(json.dumps({"error": "No stock code provided."}), file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="获取指定A股的核心财务指标。")
+    parser.add_argument("stock_code", help="要查询的股票代码")
+    parser.add_argument("--ipc", choices=IPC_FORMATS, default="json",
+                        help="结果输出格式：json 便于人工查看，pickle 供 data_integrator 读取")
+    args = parser.parse_args()
 
-    stock_code_arg = sys.argv[1]
-    
-    df, raw_data, error = get_stock_details(stock_code_arg)
-    
-    if error:
-        # Print error as JSON to stderr
-        print(json.dumps({"error": error}), file=sys.stderr)
-        sys.exit(1)
-
-    # Serialize DataFrame to JSON and combine with other data
-    result = {
-        "dataframe": df.to_json(orient='split', index=False), # DataFrame转为JSON字符串
-        "raw_data": raw_data,
-        "error": error
-    }
-    
-    # [FIX 2] Print the final result as a UTF-8 encoded JSON string to stdout's byte buffer.
-    # This is the definitive way to fix encoding issues in subprocess communication.
-    encoded_result = json.dumps(result, ensure_ascii=False).encode('utf-8')
-    sys.stdout.buffer.write(encoded_result) 
\ No newline at end of file
+    df, raw_data, error = get_stock_details(args.stock_code)
+
+    # 与港股脚本使用同一个结果约定，出错时错误信息放在结果的 error 字段中。
+    # JSON 以UTF-8字节写入 stdout 并包在哨兵行之间，避免编码问题，也便于父进程直接定位。
+    write_result(df, raw_data, error, args.ipc) 
\ No newline at end of file